@@ -1,21 +1,196 @@
 import dash
 import dash_bootstrap_components as dbc
-from dash import dcc, html
+from dash import dcc, html, Patch
 from dash.dependencies import Input, Output
-import plotly.express as px
+import flask
+import json
 import sqlite3
+import threading
+import time
+import warnings
+from collections import OrderedDict
+
+# plotly.express, plotly.graph_objects, numpy and pandas are imported where they are first
+# needed, so worker processes start without paying for them until a figure is built.
+from database import IDENTITY_COLUMNS, ConnectionPool, get_course_registry
+
+
+# Per-center reductions across all course columns. Center_Data holds averages, so N.A
+# entries are counted from the rollups' Missing column instead (function None).
+REDUCTIONS = {
+    "sum": ("Total Progress by Center", "nansum"),
+    "mean": ("Mean Progress by Center", "nanmean"),
+    "median": ("Median Progress by Center", "nanmedian"),
+    "na_count": ("N.A Count by Center", None),
+}
+
+
+def aggregate_centers(values, reduction="sum", missing=None):
+    """Reduce a (centers x courses) matrix to one value per center in a single vectorized pass.
+
+    missing is the matching matrix of N.A counts, used by the na_count reduction.
+    """
+    import numpy as np
+
+    title, function = REDUCTIONS[reduction]
+    if function is None:
+        return title, missing.sum(axis=1)
+    with warnings.catch_warnings():
+        # Centers whose courses are all N.A legitimately reduce to NaN
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return title, getattr(np, function)(values, axis=1)
+
+
+class CenterDataSnapshot:
+    """In-process copy of Center_Data shared by all dashboard components."""
+
+    def __init__(self, pool):
+        self.pool = pool
+        self._lock = threading.Lock()
+        self.version = None
+        self.rows = []
+        self.columns = []
+        self.missing = {}  # (center, course) -> students with N.A, from Center_Rollup
+        self._matrix = None
+        self.loads = 0
+
+    def refresh(self):
+        """Reload Center_Data only if PRAGMA data_version moved since the last load."""
+        version = self.pool.data_version()
+        with self._lock:
+            if version != self.version:
+                cursor = self.pool.connection().cursor()
+                try:
+                    cursor.execute("SELECT * FROM Center_Data")
+                    self.rows = cursor.fetchall()
+                    self.columns = [description[0] for description in cursor.description]
+                    try:
+                        cursor.execute("SELECT Center, Course, Missing FROM Center_Rollup")
+                        self.missing = {(center, course): count for center, course, count in cursor.fetchall()}
+                    except sqlite3.OperationalError:  # Rollups not created yet (the form creates them)
+                        self.missing = {}
+                finally:
+                    cursor.close()
+                self._matrix = None
+                self.version = version
+                self.loads += 1
+            return self.rows, self.columns
+
+    def matrix(self):
+        """Return (centers, courses, values, missing), built together once per data version.
+
+        values is the float matrix of Center_Data averages and missing the matching matrix
+        of N.A counts: one row per center, one column per course.
+        """
+        import numpy as np
+        import pandas as pd
+
+        self.refresh()
+        with self._lock:
+            if self._matrix is None:
+                frame = pd.DataFrame.from_records(self.rows, columns=self.columns)
+                courses = [col for col in self.columns if col not in IDENTITY_COLUMNS]
+                values = frame[courses].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+                center_names = frame["Center"].to_numpy(dtype=object)
+                missing = np.array(
+                    [[self.missing.get((center, course), 0) for course in courses] for center in center_names],
+                    dtype=float,
+                ).reshape(len(center_names), len(courses))
+                self._matrix = (center_names, courses, values, missing)
+            return self._matrix
+
+    def select(self, centers):
+        """Return the snapshot rows for the given centers (all rows if none are given)."""
+        rows, columns = self.refresh()
+        if centers:
+            wanted = set(centers)
+            center_index = columns.index("Center")
+            rows = [row for row in rows if row[center_index] in wanted]
+        return rows, columns
+
+
+class FigureCache:
+    """Thread-safe LRU cache of serialized figure JSON with a time-to-live."""
+
+    def __init__(self, max_entries=256, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, figure JSON strings)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes = 0
+
+    @staticmethod
+    def make_key(kind, course, centers, version):
+        """Normalize a selection so that reordered center lists share one entry."""
+        return kind, course, tuple(sorted(set(centers or ()))), version
+
+    def get_or_build(self, key, build):
+        """Return the cached figures for key, calling build() and storing its result on a miss."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return [json.loads(payload) for payload in entry[1]]
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+
+        # Build outside the lock so slow figures do not serialize other callbacks
+        payloads = [figure.to_json() for figure in build()]
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (now + self.ttl, payloads)
+            self.bytes += sum(len(payload) for payload in payloads)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+        return [json.loads(payload) for payload in payloads]
+
+    def _remove(self, key):
+        _expires_at, payloads = self._entries.pop(key)
+        self.bytes -= sum(len(payload) for payload in payloads)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "hit_ratio": self.hits / total if total else 0.0,
+            }
+
 
 class DashboardComponent:
-    def __init__(self, db_file):
+    def __init__(self, db_file, pool=None, snapshot=None, figure_cache=None):
         self.db_file = db_file
+        self.pool = pool if pool is not None else ConnectionPool(db_file)
+        self.snapshot = snapshot if snapshot is not None else CenterDataSnapshot(self.pool)
+        self.figure_cache = figure_cache if figure_cache is not None else FigureCache()
+        self.courses = get_course_registry(db_file)
+
+    def cache_key(self, kind, course, centers):
+        """Key a figure on the selection and the snapshot version it was built from."""
+        self.snapshot.refresh()
+        return self.figure_cache.make_key(kind, course, centers, self.snapshot.version)
 
     def fetch_data(self, query, params=()):
-        """Fetch data from the SQLite database."""
-        with sqlite3.connect(self.db_file) as conn:
-            cursor = conn.cursor()
+        """Fetch data from the SQLite database using the thread's pooled connection."""
+        cursor = self.pool.connection().cursor()
+        try:
             cursor.execute(query, params)
             data = cursor.fetchall()
             columns = [description[0] for description in cursor.description]
+        finally:
+            cursor.close()
         return data, columns
 
 
@@ -24,18 +199,25 @@ class BarGraph(DashboardComponent):
         if not course:
             raise dash.exceptions.PreventUpdate
 
-        query = f"SELECT Center, `{course}` FROM Center_Data"
-        if centers:
-            placeholders = ', '.join(['?'] * len(centers))
-            query += f" WHERE Center IN ({placeholders})"
-            data, columns = self.fetch_data(query, tuple(centers))
-        else:
-            data, columns = self.fetch_data(query)
+        key = self.cache_key("bar", course, centers)
+        (fig,) = self.figure_cache.get_or_build(key, lambda: [self.build_figure(course, centers)])
+        return fig
+
+    def bar_data(self, course, centers):
+        """Return the (centers, values) pairs plotted for a course."""
+        rows, columns = self.snapshot.select(centers)
+        if not rows:
+            return [], []
+        center_index, course_index = columns.index("Center"), columns.index(course)
+        return [row[center_index] for row in rows], [row[course_index] for row in rows]
+
+    def build_figure(self, course, centers):
+        import plotly.express as px
 
-        if not data:
+        centers, values = self.bar_data(course, centers)
+        if not centers:
             return px.bar(title="No Data Available")
 
-        centers, values = zip(*data)
         fig = px.bar(
             x=centers,
             y=values,
@@ -46,30 +228,67 @@ class BarGraph(DashboardComponent):
         )
         return fig
 
+    def base_figure(self):
+        """Layout and styling sent once; later updates only patch the trace data."""
+        import plotly.colors
+        import plotly.graph_objects as go
+
+        return go.Figure(
+            go.Bar(x=[], y=[], marker=dict(color=[], colorscale=plotly.colors.diverging.Armyrose, showscale=True)),
+            layout=dict(title=dict(text="Select a course"), xaxis=dict(title=dict(text="Center"))),
+        )
+
+    def patch(self, course, centers):
+        if not course:
+            raise dash.exceptions.PreventUpdate
+
+        centers, values = self.bar_data(course, centers)
+        fig = Patch()
+        fig["data"][0]["x"] = centers
+        fig["data"][0]["y"] = values
+        fig["data"][0]["marker"]["color"] = values
+        fig["layout"]["title"]["text"] = f"{course} Progress by Center" if centers else "No Data Available"
+        fig["layout"]["yaxis"]["title"]["text"] = course
+        return fig
+
 
 class PieLineCharts(DashboardComponent):
+    reduction = "sum"  # One of REDUCTIONS, used for the pie chart when no course is selected
+
     def update(self, centers, course):
-        # Fetch data for selected centers
-        query = "SELECT Center, `Course A`, `Course B`, `Course C`, `Course D`, `Course E` FROM Center_Data"
-        if centers:
-            placeholders = ', '.join(['?'] * len(centers))
-            query += f" WHERE Center IN ({placeholders})"
-            data, columns = self.fetch_data(query, tuple(centers))
-        else:
-            data, columns = self.fetch_data(query)
+        key = self.cache_key(f"pie-line-{self.reduction}", course, centers)
+        pie_fig, line_fig = self.figure_cache.get_or_build(key, lambda: self.build_figures(centers, course))
+        return pie_fig, line_fig
 
-        if not data:
-            return px.pie(title="No Data Available"), px.line(title="No Data Available")
+    def chart_data(self, centers, course):
+        """Return the pie title, pie values by center, the line x values and line series by course."""
+        import numpy as np
+
+        center_names, courses, values, missing = self.snapshot.matrix()
+        if centers:
+            selected = np.isin(center_names, list(centers))
+            center_names, values, missing = center_names[selected], values[selected], missing[selected]
 
         # Pie Chart
         if course:
             # If a course is selected, show percentages for the selected course
-            df_pie = {row[0]: row[columns.index(course)] for row in data}
-            pie_title = f"{course} Progress by Center"
+            pie_title, pie_values = f"{course} Progress by Center", values[:, courses.index(course)]
         else:
-            # If no course is selected, show total progress
-            df_pie = {row[0]: sum(row[1:]) for row in data}
-            pie_title = "Total Progress by Center"
+            # If no course is selected, reduce every course per center (total progress by default)
+            pie_title, pie_values = aggregate_centers(values, self.reduction, missing)
+        centers = center_names.tolist()
+        df_pie = dict(zip(centers, pie_values.tolist()))
+
+        # Line Chart
+        line_data = {col: values[:, i] for i, col in enumerate(courses)}
+        return pie_title, df_pie, centers, line_data
+
+    def build_figures(self, centers, course):
+        import plotly.express as px
+
+        pie_title, df_pie, centers, line_data = self.chart_data(centers, course)
+        if not df_pie:
+            return px.pie(title="No Data Available"), px.line(title="No Data Available")
 
         pie_fig = px.pie(
             names=list(df_pie.keys()),
@@ -79,38 +298,66 @@ class PieLineCharts(DashboardComponent):
         )
         pie_fig.update_traces(marker=dict(line=dict(color='#ffffff', width=2)))
 
-        # Line Chart (unchanged)
-        centers = [row[0] for row in data]
-        line_data = {col: [row[i + 1] for row in data] for i, col in enumerate(columns[1:])}
         line_fig = px.line(
             x=centers,
-            y=[line_data[col] for col in columns[1:]],
+            y=list(line_data.values()),
             title="Progress Over Centers",
             labels={"x": "Center", "y": "Progress"},
             markers=True,
         )
-        for i, col in enumerate(columns[1:]):
+        for i, col in enumerate(line_data):
             line_fig.data[i].name = col  # Set legend names
 
         return pie_fig, line_fig
 
+    def base_figures(self):
+        """Pie and line layouts sent once; later updates only patch the trace data."""
+        import plotly.colors
+        import plotly.graph_objects as go
+
+        pie_fig = go.Figure(
+            go.Pie(
+                labels=[],
+                values=[],
+                marker=dict(colors=plotly.colors.qualitative.Pastel, line=dict(color='#ffffff', width=2)),
+            )
+        )
+        line_fig = go.Figure(
+            layout=dict(
+                title=dict(text="Progress Over Centers"),
+                xaxis=dict(title=dict(text="Center")),
+                yaxis=dict(title=dict(text="Progress")),
+            )
+        )
+        return pie_fig, line_fig
+
+    def patch(self, centers, course):
+        pie_title, df_pie, centers, line_data = self.chart_data(centers, course)
+
+        pie_fig = Patch()
+        pie_fig["data"][0]["labels"] = list(df_pie.keys())
+        pie_fig["data"][0]["values"] = list(df_pie.values())
+        pie_fig["layout"]["title"]["text"] = pie_title if df_pie else "No Data Available"
+
+        # The number of course series can change, so the (small) trace list is replaced wholesale
+        line_fig = Patch()
+        line_fig["data"] = [
+            {"type": "scatter", "mode": "lines+markers", "x": centers, "y": values, "name": col}
+            for col, values in line_data.items()
+        ]
+        return pie_fig, line_fig
+
 class DropdownComponent(DashboardComponent):
     def update(self, centers):
-        query = "SELECT * FROM Center_Data"
-        if centers:
-            placeholders = ', '.join(['?'] * len(centers))
-            query += f" WHERE Center IN ({placeholders})"
-            data, columns = self.fetch_data(query, tuple(centers))
-        else:
-            data, columns = self.fetch_data(query)
-
-        course_columns = [col for col in columns if col != "Center"]
+        # Only the column names are needed, so read them from the shared registry instead of the table
+        course_columns = self.courses.course_columns("Center_Data")
         return [{"label": col, "value": col} for col in course_columns]
 
 
 class LayoutComponent:
-    def __init__(self, db_file):
+    def __init__(self, db_file, figures=None):
         self.db_file = db_file
+        self.figures = figures or {}
         self.container = dbc.Container(
             fluid=True,
             style={"background-color": "#fff5d1", "color": "#000000", "font-family": "Georgia"},
@@ -130,7 +377,7 @@ class LayoutComponent:
                                                     html.H6("Bar Graph", style={"color": "#ffffff", "font-weight": "bold"}),
                                                     style={"background-color": "#6873af"},
                                                 ),
-                                                dbc.CardBody(dcc.Graph(id="graph")),
+                                                dbc.CardBody(self.graph("graph")),
                                             ],
                                             style={"background-color": "#ffffff", "margin": "10px"},
                                         ),
@@ -191,7 +438,7 @@ class LayoutComponent:
                                                     html.H6("Pie Chart", style={"color": "#ffffff", "font-weight": "bold"}),
                                                     style={"background-color": "#6873af"},
                                                 ),
-                                                dbc.CardBody(dcc.Graph(id="pie-chart")),
+                                                dbc.CardBody(self.graph("pie-chart")),
                                             ],
                                             style={"background-color": "#ffffff", "margin": "10px"},
                                         ),
@@ -206,7 +453,7 @@ class LayoutComponent:
                                                     html.H6("Line Chart", style={"color": "#ffffff", "font-weight": "bold"}),
                                                     style={"background-color": "#6873af"},
                                                 ),
-                                                dbc.CardBody(dcc.Graph(id="line-chart")),
+                                                dbc.CardBody(self.graph("line-chart")),
                                             ],
                                             style={"background-color": "#ffffff", "margin": "10px"},
                                         ),
@@ -220,18 +467,44 @@ class LayoutComponent:
         )
 
 
+    def graph(self, graph_id):
+        """Build a graph, pre-filled with its base figure when partial updates are enabled."""
+        if graph_id in self.figures:
+            return dcc.Graph(id=graph_id, figure=self.figures[graph_id])
+        return dcc.Graph(id=graph_id)
+
+
 class DashboardApp:
-    def __init__(self, db_file="graph_data.db"):
+    def __init__(self, db_file="graph_data.db", partial_updates=False, pie_reduction="sum", requests_pathname_prefix="/"):
         self.db_file = db_file
-        self.app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
-        self.layout = LayoutComponent(db_file)
-        self.setup_layout()
+        self.partial_updates = partial_updates
+        self.app = dash.Dash(
+            __name__, external_stylesheets=[dbc.themes.BOOTSTRAP], requests_pathname_prefix=requests_pathname_prefix
+        )
+
+        # One pool shared by every component, so each worker thread keeps a single connection
+        self.pool = ConnectionPool(db_file)
+        # Every callback reads the same Center_Data snapshot, so one interaction costs at most one query
+        self.snapshot = CenterDataSnapshot(self.pool)
+        # Figures are cached per (course, centers, data version), so flipping between selections is free
+        self.figure_cache = FigureCache()
+        self.bar_graph = BarGraph(db_file, self.pool, self.snapshot, self.figure_cache)
+        self.dropdown = DropdownComponent(db_file, self.pool, self.snapshot, self.figure_cache)
+        self.pie_line_charts = PieLineCharts(db_file, self.pool, self.snapshot, self.figure_cache)
+        self.pie_line_charts.reduction = pie_reduction
 
-        self.bar_graph = BarGraph(db_file)
-        self.dropdown = DropdownComponent(db_file)
-        self.pie_line_charts = PieLineCharts(db_file)
+        if partial_updates:
+            # Layouts are sent once with the page; callbacks then return Patch objects with trace data only
+            pie_fig, line_fig = self.pie_line_charts.base_figures()
+            figures = {"graph": self.bar_graph.base_figure(), "pie-chart": pie_fig, "line-chart": line_fig}
+            bar_update, pie_line_update = self.bar_graph.patch, self.pie_line_charts.patch
+        else:
+            figures = None
+            bar_update, pie_line_update = self.bar_graph.update, self.pie_line_charts.update
+        self.layout = LayoutComponent(db_file, figures)
+        self.setup_layout()
 
-        self.app.callback(Output("graph", "figure"), [Input("Course_dropdown", "value"), Input("center-checklist", "value")])(self.bar_graph.update)
+        self.app.callback(Output("graph", "figure"), [Input("Course_dropdown", "value"), Input("center-checklist", "value")])(bar_update)
         self.app.callback(Output("Course_dropdown", "options"), [Input("center-checklist", "value")])(self.dropdown.update)
         self.app.callback(
             Output("center-checklist", "options"),
@@ -241,31 +514,37 @@ class DashboardApp:
         self.app.callback(
             [Output("pie-chart", "figure"), Output("line-chart", "figure")],
             [Input("center-checklist", "value"), Input("Course_dropdown", "value")],
-        )(self.pie_line_charts.update)
+        )(pie_line_update)
 
-        def update_center_checklist(self, _):
-            """Fetches and updates the checklist with all available centers from the database."""
-            with sqlite3.connect(self.db_file) as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT Center FROM Center_Data")
-                centers = cursor.fetchall()
-            return [{"label": center[0], "value": center[0]} for center in centers]
+        self.app.server.route("/stats/pool")(self.pool_stats)
+        self.app.server.route("/stats/figure-cache")(self.figure_cache_stats)
 
     def setup_layout(self):
         self.app.layout = self.layout.container
 
     def update_center_checklist(self, _):
-        with sqlite3.connect(self.db_file) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT Center FROM Center_Data")
-            centers = cursor.fetchall()
-        return [{"label": center[0], "value": center[0]} for center in centers]
+        """Fetches and updates the checklist with all available centers from the database."""
+        rows, columns = self.snapshot.refresh()
+        center_index = columns.index("Center")
+        return [{"label": row[center_index], "value": row[center_index]} for row in rows]
+
+    def pool_stats(self):
+        """Expose connection pool hit/miss counters."""
+        return flask.jsonify(dict(self.pool.stats(), snapshot_loads=self.snapshot.loads))
+
+    def figure_cache_stats(self):
+        """Expose figure cache hit ratio and memory use."""
+        return flask.jsonify(self.figure_cache.stats())
 
     def run_app(self):
-        if __name__ == "__main__":
-            self.app.run_server(debug=True, port=8050)
+        self.app.run_server(debug=True, port=8050)
+
+
+def create_app(db_file="graph_data.db", **options):
+    """Application factory: build a DashboardApp without doing any work at import time."""
+    return DashboardApp(db_file, **options)
 
 
 # Run the app
-dashboard = DashboardApp()
-dashboard.run_app()
+if __name__ == "__main__":
+    create_app().run_app()
@@ -1,30 +1,41 @@
 import dash
 import dash_bootstrap_components as dbc
 from dash import dcc, html
-from dash.dependencies import Input, Output, State
+from dash.dependencies import Input, Output, State, ALL
+import flask
 import sqlite3
 import os
-import time
+import threading
 
-# Initialize the Dash app
-app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
-app.title = "Student Data Entry Form"
-app.config['suppress_callback_exceptions'] = True  # Suppress callback exceptions warning
+from database import (
+    ConnectionPool,
+    WriteQueue,
+    ensure_center_rollups,
+    ensure_student_change_log,
+    ensure_student_identity,
+    ensure_wal,
+    get_course_registry,
+    has_student_identity,
+)
+import changefeed
+from importer import ImportFileError, file_format, import_students, read_rows, upsert_students, validate_student
 
 # Define background color and card header color
 card_header_color = '#6873af'
 page_background_color = '#fff5d1'
 
+pool = ConnectionPool("graph_data.db")
+MAX_API_BATCH = 10000  # Student records per /api/students request
+write_queue = WriteQueue("graph_data.db")  # The only connection in this process that writes
+
+# Every course dropdown offers the same choices, so they are built once
+PROGRESS_OPTIONS = [{"label": f"{i}%", "value": i} for i in range(0, 101)] + [{"label": "N.A", "value": "N.A"}]
+
 # Function to load center options from SQLite
 def load_center_options():
     try:
-        conn = sqlite3.connect("graph_data.db", isolation_level=None)
-        cursor = conn.cursor()
-
         # Fetch centers from the Center_Data table
-        cursor.execute("SELECT DISTINCT Center FROM Center_Data")
-        centers = cursor.fetchall()
-        conn.close()
+        centers = pool.connection().execute("SELECT DISTINCT Center FROM Center_Data").fetchall()
 
         # Return valid options
         return [{"label": center[0], "value": center[0]} for center in centers]
@@ -34,22 +45,37 @@ def load_center_options():
     except Exception as e:
         return [{"label": f"Error loading centers: {str(e)}", "value": None}]
 
-# Function to load course fields (columns) from SQLite
+# Function to load course fields (columns) from the shared, schema-version-aware registry
 def load_course_fields():
     try:
-        conn = sqlite3.connect("graph_data.db")
-        cursor = conn.cursor()
-        cursor.execute("PRAGMA table_info(Student_Data)")  # Get table info for Student_Data
-        columns = cursor.fetchall()
-        conn.close()
-        return [col[1] for col in columns if col[1].startswith("Course")]  # Only return "Course" fields
+        return get_course_registry("graph_data.db").course_columns("Student_Data")
     except Exception as e:
         print(f"Error loading centers: {e}")  # Debug statement
         return [{"label": f"Error: {e}", "value": None}]
 
+# Make sure the center rollups (backfilled) and the unique student key exist before the first submission
+def prepare_database():
+    try:
+        # mode=rw: a missing database is reported, not created empty
+        conn = sqlite3.connect("file:graph_data.db?mode=rw", uri=True)
+        ensure_wal(conn)
+        ensure_student_change_log(conn)
+        ensure_center_rollups(conn)
+        conn.commit()
+        try:
+            ensure_student_identity(conn)
+            conn.commit()
+        except sqlite3.IntegrityError as e:
+            # Saves still work, through the slower lookup-then-UPDATE/INSERT path
+            print(f"WARNING: {e}. Form saves fall back to matching students by name until duplicates are removed.")
+        conn.close()
+    except Exception as e:
+        print(f"Error preparing the database: {e}")  # Debug statement
+
 # Function to update dropdown fields dynamically
-def update_fields():
-    course_fields = load_course_fields()
+def update_fields(course_fields=None):
+    if course_fields is None:
+        course_fields = load_course_fields()
     children = []
     for field in course_fields:
         children.append(
@@ -57,8 +83,8 @@ def update_fields():
                 [
                     dbc.Label(field),
                     dcc.Dropdown(
-                        id=field.lower().replace(" ", "-"),
-                        options=[{"label": f"{i}%", "value": i} for i in range(0, 101)] + [{"label": "N.A", "value": "N.A"}],
+                        id={"type": "course-field", "course": field},
+                        options=PROGRESS_OPTIONS,
                         className="dropdown",
                     ),
                 ],
@@ -68,17 +94,7 @@ def update_fields():
     return children
 
 # Callback for handling data entry and updating the database
-@app.callback(
-    Output("message", "children"),
-    [Input("submit-button", "n_clicks")],
-    [
-        State("first-name", "value"),
-        State("last-name", "value"),
-        State("center", "value"),
-        *[State(field.lower().replace(" ", "-"), "value") for field in load_course_fields()]
-    ],
-)
-def enter_data(n_clicks, first_name, last_name, center, *course_values):
+def enter_data(n_clicks, first_name, last_name, center, course_values):
     if n_clicks is None or n_clicks <= 0:
         return ""  # No action if no button click
 
@@ -86,71 +102,174 @@ def enter_data(n_clicks, first_name, last_name, center, *course_values):
         return "First name and last name are required."
 
     try:
-        conn = sqlite3.connect("graph_data.db")
-        cursor = conn.cursor()
+        # Course names come from the rendered field ids, so new categories need no restart
+        course_fields = [state["id"]["course"] for state in dash.callback_context.states_list[3]]
+        return write_queue.run(save_student, first_name, last_name, center, course_fields, course_values)
+    except Exception as e:
+        return f"An error occurred: {str(e)}"
+
+# Runs on the writer thread, inside its transaction
+def save_student(conn, first_name, last_name, center, course_fields, course_values):
+    # Triggers update the center rollups in this transaction; a new category needs new ones
+    ensure_center_rollups(conn)
+    cursor = conn.cursor()
+
+    # Check if the student already exists (an index lookup on the unique name key)
+    cursor.execute(
+        "SELECT * FROM Student_Data WHERE `First Name` = ? AND `Last Name` = ?",
+        (first_name, last_name),
+    )
+    existing_student = cursor.fetchone()
+    if existing_student:
+        existing_student = dict(zip([description[0] for description in cursor.description], existing_student))
 
-        # Check if the student already exists
+    fields = ["First Name", "Last Name", "Center", *course_fields]
+    column_names = ", ".join(f"`{field}`" for field in fields)
+    placeholders = ", ".join(["?"] * len(fields))
+    if has_student_identity(conn):
+        # Insert or update the whole row in one statement
+        assignments = ", ".join(f"`{field}` = excluded.`{field}`" for field in fields[2:])
         cursor.execute(
-            "SELECT * FROM Student_Data WHERE `First Name` = ? AND `Last Name` = ?",
-            (first_name, last_name),
+            f"INSERT INTO Student_Data ({column_names}) VALUES ({placeholders}) "
+            f"ON CONFLICT (`First Name`, `Last Name`) DO UPDATE SET {assignments}",
+            (first_name, last_name, center, *course_values),
+        )
+    elif existing_student:
+        # Duplicate names block the unique index (see prepare_database)
+        assignments = ", ".join(f"`{field}` = ?" for field in fields[2:])
+        cursor.execute(
+            f"UPDATE Student_Data SET {assignments} WHERE `First Name` = ? AND `Last Name` = ?",
+            (center, *course_values, first_name, last_name),
+        )
+    else:
+        cursor.execute(
+            f"INSERT INTO Student_Data ({column_names}) VALUES ({placeholders})",
+            (first_name, last_name, center, *course_values),
         )
-        existing_student = cursor.fetchone()
 
-        course_fields = load_course_fields()
+    return "Data updated successfully!" if existing_student else "Data saved successfully!"
+
+# Bulk import: POST a CSV/XLSX file as "file" (?dry_run=true only validates)
+def upload_import():
+    upload = flask.request.files.get("file")
+    fmt = file_format(upload.filename) if upload else None
+    if fmt is None:
+        return flask.jsonify(error="Upload a .csv or .xlsx file as 'file'."), 400
+    try:
+        report = import_students(
+            read_rows(upload.stream, fmt), "graph_data.db", dry_run=flask.request.args.get("dry_run") == "true",
+            write_queue=write_queue,
+        )
+    except ImportFileError as e:
+        return flask.jsonify(error=str(e)), 400
+    except Exception as e:
+        return flask.jsonify(error=f"An error occurred: {e}"), 500
+    return flask.jsonify(report.as_dict())
 
-        # Update or Insert Data
-        if existing_student:
-            # Update existing record
-            for i, field in enumerate(course_fields):
-                cursor.execute(
-                    f"UPDATE Student_Data SET `{field}` = ? WHERE `First Name` = ? AND `Last Name` = ?",
-                    (course_values[i], first_name, last_name),
-                )
-            cursor.execute(
-                "UPDATE Student_Data SET Center = ? WHERE `First Name` = ? AND `Last Name` = ?",
-                (center, first_name, last_name),
+class FormLayoutCache:
+    """Keeps the built form in memory, rebuilding it only when the centers or categories change.
+
+    PRAGMA data_version tells us whether anything was written at all, so an unchanged
+    database costs one pragma per render and no queries.
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+        self._lock = threading.Lock()
+        self.version = None
+        self.key = None
+        self.layout = None
+        self.builds = 0
+
+    def get(self):
+        version = self.pool.data_version()
+        with self._lock:
+            if version != self.version:
+                center_options = load_center_options()
+                course_fields = load_course_fields()
+                key = (repr(center_options), repr(course_fields))
+                if key != self.key:
+                    self.layout = build_form(center_options, course_fields)
+                    self.key = key
+                    self.builds += 1
+                self.version = version
+            return self.layout
+
+
+form_cache = FormLayoutCache(pool)
+
+# Batch JSON API: POST [{"first_name", "last_name", "center", "courses": {course: progress}}, ...]
+# Records are validated like form submissions and applied in one transaction; omitted
+# courses keep their current value. Returns one result per record, in order.
+def upsert_students_api():
+    records = flask.request.get_json(silent=True)
+    if isinstance(records, dict):
+        records = records.get("students")
+    if not isinstance(records, list):
+        return flask.jsonify(error="Expected a JSON array of student records."), 400
+    if len(records) > MAX_API_BATCH:
+        return flask.jsonify(error=f"At most {MAX_API_BATCH} records per request."), 413
+
+    courses = load_course_fields()
+    centers = {option["value"] for option in load_center_options()}
+    sent = {course for record in records if isinstance(record, dict)
+            for course in (record.get("courses") if isinstance(record.get("courses"), dict) else {})}
+    batch_courses = [course for course in courses if course in sent]
+
+    results = [None] * len(records)
+    batch = {}  # (first name, last name) -> student; a repeated student merges, later values winning
+    positions = {}
+    for index, record in enumerate(records):
+        try:
+            if not isinstance(record, dict):
+                raise ValueError("Expected an object")
+            values = record.get("courses") or {}
+            if not isinstance(values, dict):
+                raise ValueError("courses must be an object of course: progress")
+            unknown = sorted(set(values) - set(courses))
+            if unknown:
+                raise ValueError(f"Unknown course(s): {', '.join(unknown)}")
+            student = validate_student(
+                {"First Name": record.get("first_name") or "", "Last Name": record.get("last_name") or "",
+                 "Center": record.get("center") or "", **values},
+                batch_courses,
+                centers,
             )
-            message = "Data updated successfully!"
-        else:
-            # Insert new record
-            placeholders = ", ".join(["?"] * (3 + len(course_fields)))
-            column_names = "`First Name`, `Last Name`, Center, " + ", ".join([f"`{field}`" for field in course_fields])
-            query = f"INSERT INTO Student_Data ({column_names}) VALUES ({placeholders})"
-            cursor.execute(query, (first_name, last_name, center, *course_values))
-            message = "Data saved successfully!"
+        except ValueError as e:
+            results[index] = {"index": index, "status": "error", "error": str(e)}
+            continue
+        key = (student["First Name"], student["Last Name"])
+        if key in batch:
+            student = dict(batch[key], **{k: v for k, v in student.items() if v is not None})
+        batch[key] = student
+        positions.setdefault(key, []).append(index)
 
-        conn.commit()
-        conn.close()
-        return message
+    try:
+        statuses = write_queue.run(upsert_students, list(batch.values()), batch_courses, False) if batch else []
     except Exception as e:
-        return f"An error occurred: {str(e)}"
+        return flask.jsonify(error=f"An error occurred: {e}"), 500
+    for key, status in zip(batch, statuses):
+        for index in positions[key]:
+            results[index] = {"index": index, "status": status}
 
-# Callback to update dropdown options and fields periodically
-@app.callback(
-    Output('hidden-div', 'children'),
-    [Input('interval-component', 'n_intervals')]
-)
-def update_data(n_intervals):
-    load_center_options()
-    update_fields()
-    return time.strftime('%Y-%m-%d %H:%M:%S')
+    return flask.jsonify(
+        inserted=statuses.count("inserted"),
+        updated=statuses.count("updated"),
+        errors=sum(1 for result in results if result["status"] == "error"),
+        results=results,
+    )
 
-# Define the app layout
-app.layout = html.Div([
-    html.Div(
-        id="main-content",
-        style={'background-color': page_background_color, 'height': '100vh', 'margin': '0'}
-    ),
-    dcc.Interval(id='interval-component', interval=5*60*1000, n_intervals=0),  # Update every 5 minutes
-    html.Div(id='hidden-div', style={'display': 'none'})
-])
-
-# Update main content with the form layout
-@app.callback(
-    Output("main-content", "children"),
-    [Input('hidden-div', 'children')]
-)
-def update_main_content(_):
+def write_queue_stats():
+    return flask.jsonify(write_queue.stats())
+
+change_feed = changefeed.ChangeFeed(pool)
+FEED_KEYS = ["schema", "centers"]  # What the form is built from
+
+# Update main content with the form layout (runs when centers or categories change)
+def update_main_content(_version):
+    return form_cache.get()
+
+def build_form(center_options, course_fields):
     return dbc.Card(
         children=[
             dbc.CardHeader(
@@ -185,7 +304,7 @@ def update_main_content(_):
                                     dbc.Label("Center"),
                                     dcc.Dropdown(
                                         id="center",
-                                        options=load_center_options(),
+                                        options=center_options,
                                         className="dropdown",
                                     ),
                                 ],
@@ -195,7 +314,7 @@ def update_main_content(_):
                         className="mb-3",
                     ),
                     dbc.Row(
-                        update_fields(),
+                        update_fields(course_fields),
                         className="mb-3",
                     ),
                     dbc.Button(
@@ -220,7 +339,47 @@ def update_main_content(_):
         }
     )
 
+# Define the app layout
+def build_layout():
+    return html.Div([
+        html.Div(
+            id="main-content",
+            style={'background-color': page_background_color, 'height': '100vh', 'margin': '0'}
+        ),
+        *changefeed.components(change_feed, FEED_KEYS),  # Replaces the 5-minute Interval: refetch only on actual changes
+    ])
+
+
+def create_app(requests_pathname_prefix="/"):
+    """Application factory: build the Dash app and register its callbacks."""
+    app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP], requests_pathname_prefix=requests_pathname_prefix)
+    app.title = "Student Data Entry Form"
+    app.config['suppress_callback_exceptions'] = True  # Suppress callback exceptions warning
+    app.layout = build_layout  # Served per page load, with the current data version
+    prepare_database()
+
+    app.callback(
+        Output("message", "children"),
+        [Input("submit-button", "n_clicks")],
+        [
+            State("first-name", "value"),
+            State("last-name", "value"),
+            State("center", "value"),
+            State({"type": "course-field", "course": ALL}, "value"),  # Whatever categories the form rendered
+        ],
+    )(enter_data)
+    changefeed.watch(app, change_feed, FEED_KEYS)
+    app.callback(
+        Output("main-content", "children"),
+        [Input('data-version', 'data')]
+    )(update_main_content)
+    app.server.route("/import", methods=["POST"])(upload_import)
+    app.server.route("/api/students", methods=["POST"])(upsert_students_api)
+    app.server.route("/stats/write-queue")(write_queue_stats)
+    return app
+
+
 # Run the app
 if __name__ == "__main__":
-    app.run_server(debug=True, port=8051)
+    create_app().run_server(debug=True, port=8051)
 
@@ -1,148 +1,344 @@
-import openpyxl
 import dash
 import dash_bootstrap_components as dbc
 from dash import dcc, html, Input, Output
-import pandas as pd
 import plotly.graph_objects as go
 from flask import send_file
-from io import BytesIO
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
+from urllib.parse import parse_qs, urlencode
 import flask
-import plotly.io as pio
 from dash.exceptions import PreventUpdate
-import time
+import bisect
+import functools
+import heapq
+import itertools
+import re
+import threading
 
 import sqlite3
 
-# Connect to your SQL database
-conn = sqlite3.connect('graph_data.db')
-cursor = conn.cursor()
+from database import (
+    IDENTITY_COLUMNS,
+    ConnectionPool,
+    ensure_student_change_log,
+    ensure_student_indexes,
+    ensure_student_search,
+    ensure_wal,
+    get_course_registry,
+    search_expression,
+)
+import changefeed
+from exports import EXPORT_TABLES, export_columns, export_rows, stream_csv, stream_xlsx
+from reports import ReportQueue, ReportStudent
 
-# Query the Student_Data table
-cursor.execute("SELECT * FROM Student_Data")
-students = cursor.fetchall()
+# reportlab and plotly.io are only needed to render reports, which happens in reports.py
+# (and usually in its worker processes) instead of at startup.
 
-# Fetch the column headers (you can either specify them or fetch them dynamically)
-cursor.execute("PRAGMA table_info(Student_Data)")
-header = [column[1] for column in cursor.fetchall()]
+course_registry = get_course_registry('graph_data.db')
+pool = ConnectionPool('graph_data.db')
+page_background_color = '#fff5d1'
+PAGE_SIZE = 50  # Student cards per page on the "/" grid; override with ?size=
+MAX_PAGE_SIZE = 500
 
-# Close the connection
-conn.close()
 
-# Create a DataFrame from the students' data
-import pandas as pd
-df_students = pd.DataFrame(students, columns=header)
+def mount_prefix():
+    return flask.request.script_root if flask.has_request_context() else ""
 
-# Create a DataFrame from the students' data
-df_students = pd.DataFrame(students, columns=header)
 
-# Initialize the Dash app
-app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
-server = app.server  # Explicitly define the Flask server
-app.config.suppress_callback_exceptions = True  # Suppress callback exceptions
-page_background_color = '#fff5d1'
+def local_path(pathname):
+    """Strip the mount prefix (SCRIPT_NAME) so routes match whether or not the app is mounted."""
+    prefix = mount_prefix()
+    if prefix and pathname and pathname.startswith(prefix):
+        return pathname[len(prefix):] or "/"
+    return pathname
 
-def generate_pdf(student, graph_figure):
-    pdf_buffer = BytesIO()
-    doc = SimpleDocTemplate(pdf_buffer, pagesize=letter)
-
-    # Define styles
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'Title',
-        parent=styles['Title'],
-        fontName='Helvetica-Bold',
-        fontSize=20,
-        spaceAfter=12,
-        textColor=colors.cornflowerblue,
-    )
-    heading_style = ParagraphStyle(
-        'Heading1',
-        parent=styles['Heading1'],
-        fontName='Helvetica-Bold',
-        fontSize=14,
-        spaceAfter=6,
-        textColor=colors.cornflowerblue,
-    )
-    body_style = ParagraphStyle(
-        'BodyText',
-        parent=styles['BodyText'],
-        fontName='Helvetica',
-        fontSize=12,
-        spaceAfter=6,
-        textColor=colors.black,
-    )
-    # Build content
-    title = Paragraph(f"Student Report for {student[0]} {student[1]}", title_style)
-    center_info = Paragraph(f"Center: {student[2]}", body_style)
-    progress_heading = Paragraph("Course Progress:", heading_style)
-
-    # Build table data
-    table_data = [['Course', 'Progress']]
-    table_data.extend([(header[i + 3], f"{student[i + 3]}%") for i in range(len(header) - 3)])
-
-    # Define table style with larger padding and font size
-    table_style = TableStyle(
-        [
-            ('BACKGROUND', (0, 0), (-1, 0), colors.steelblue),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 16),  # Larger padding
-            ('BACKGROUND', (0, 1), (-1, -1), colors.whitesmoke),
-            ('PADDING', (0, 0), (-1, -1), 10),  # Larger padding
-            ('FONTSIZE', (0, 0), (-1, 0), 14),  # Larger font size
-            ('FONTSIZE', (0, 1), (-1, -1), 12),  # Larger font size
-        ]
-    )
 
-    # Build main table
-    main_table = Table(table_data, style=table_style)
+def app_url(path):
+    """Prefix an app-relative path with the mount prefix, if any."""
+    return mount_prefix() + path
 
-    # Add graph to PDF content
-    if graph_figure:
-        # Create a static image of the graph
-        static_image_bytes = pio.to_image(graph_figure, format='png', width=800, height=500, scale=2)
 
-        # Add the image to the PDF
-        graph_image = Image(BytesIO(static_image_bytes), width=400, height=250)  # Adjust width and height as needed
+# Function to filter out the course (category) columns
+def filter_course_columns(header):
+    return [col for col in header if col not in IDENTITY_COLUMNS]
+
+
+class StudentRecord:
+    """Render-ready view of one Student_Data row; progress is aligned with RowLayout.courses."""
+    __slots__ = ("id", "first_name", "last_name", "center", "progress")
+
+    def __init__(self, id, first_name, last_name, center, progress):
+        self.id = id
+        self.first_name = first_name
+        self.last_name = last_name
+        self.center = center
+        self.progress = progress
+
+    @property
+    def name(self):
+        return f"{self.first_name} {self.last_name}"
+
+
+class RowLayout:
+    """Column positions of one Student_Data schema, computed once and reused for every row."""
+    __slots__ = ("courses", "identity_indexes", "course_indexes")
+
+    def __init__(self, header):
+        self.courses = tuple(filter_course_columns(header))
+        self.identity_indexes = tuple(header.index(col) for col in ("ID", "First Name", "Last Name", "Center"))
+        self.course_indexes = tuple(header.index(col) for col in self.courses)
+
+    def record(self, row):
+        id_index, first_index, last_index, center_index = self.identity_indexes
+        return StudentRecord(
+            row[id_index], row[first_index], row[last_index], row[center_index],
+            tuple(row[i] for i in self.course_indexes),
+        )
+
+
+@functools.lru_cache(maxsize=8)
+def _row_layout(header):
+    return RowLayout(list(header))
+
+
+def row_layout():
+    """Return the RowLayout for the current schema (rebuilt only when the schema changes)."""
+    return _row_layout(tuple(course_registry.columns("Student_Data")))
+
+class StudentCache:
+    """In-memory Student_Data shared by the grid, detail and report paths.
+
+    Refreshed only when PRAGMA data_version moves: rows above the ID watermark are
+    new, and Student_Changes lists rows updated or deleted since the last refresh.
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+        self._lock = threading.Lock()
+        self.version = None
+        self.layout = None
+        self.records = {}  # ID -> StudentRecord
+        self.ids = []  # Sorted IDs, for keyset pagination
+        self.center_ids = {}  # Center -> its sorted IDs, so filtered pages skip no other centers
+        self.max_id = None
+        self.change_seq = 0
+        self.full_loads = 0
+        self.incremental_loads = 0
+
+    def refresh(self):
+        version = self.pool.data_version()
+        with self._lock:
+            if version == self.version:
+                return
+            layout = row_layout()
+            conn = self.pool.connection()
+            conn.execute("BEGIN")  # One read snapshot for the watermarks and the rows
+            try:
+                if layout is not self.layout or self.max_id is None:
+                    self._load_all(conn, layout)
+                else:
+                    self._load_changes(conn, layout)
+            finally:
+                conn.execute("COMMIT")
+            self.layout = layout
+            self.version = version
+
+    def _load_all(self, conn, layout):
+        self.change_seq = conn.execute("SELECT COALESCE(MAX(Seq), 0) FROM Student_Changes").fetchone()[0]
+        records = [layout.record(row) for row in conn.execute("SELECT * FROM Student_Data ORDER BY ID")]
+        self.records = {record.id: record for record in records}
+        self.ids = [record.id for record in records]
+        self.center_ids = {}
+        for record in records:
+            self.center_ids.setdefault(record.center, []).append(record.id)
+        self.max_id = self.ids[-1] if self.ids else 0
+        self.full_loads += 1
+
+    def _load_changes(self, conn, layout):
+        changes = conn.execute(
+            "SELECT ID, Seq FROM Student_Changes WHERE Seq > ? ORDER BY Seq", (self.change_seq,)
+        ).fetchall()
+        changed_ids = list({student_id for student_id, _seq in changes if student_id <= self.max_id})
+        if changes:
+            self.change_seq = changes[-1][1]
+
+        for start in range(0, len(changed_ids), 500):
+            chunk = changed_ids[start:start + 500]
+            found = conn.execute(
+                f"SELECT * FROM Student_Data WHERE ID IN ({', '.join(['?'] * len(chunk))})", chunk
+            ).fetchall()
+            for row in found:
+                record = layout.record(row)
+                self._remove(record.id)
+                self._add(record)
+            for student_id in set(chunk) - {layout.record(row).id for row in found}:
+                self._remove(student_id)  # Deleted (or renumbered) since the last refresh
+        # SQLite hands a deleted highest ID out again, so the watermark follows deletes down
+        self.max_id = self.ids[-1] if self.ids else 0
+
+        for row in conn.execute("SELECT * FROM Student_Data WHERE ID > ? ORDER BY ID", (self.max_id,)):
+            record = layout.record(row)
+            self._add(record)
+            self.max_id = record.id
+        self.incremental_loads += 1
+
+    def _add(self, record):
+        self.records[record.id] = record
+        bisect.insort(self.ids, record.id)
+        bisect.insort(self.center_ids.setdefault(record.center, []), record.id)
+
+    def _remove(self, student_id):
+        record = self.records.pop(student_id, None)
+        if record is not None:
+            del self.ids[bisect.bisect_left(self.ids, student_id)]
+            center_ids = self.center_ids[record.center]
+            del center_ids[bisect.bisect_left(center_ids, student_id)]
+            if not center_ids:
+                del self.center_ids[record.center]
+
+    def _id_lists(self, centers):
+        """The sorted ID lists to page through: all IDs, or one list per wanted center."""
+        if not centers:
+            return [self.ids]
+        return [self.center_ids[center] for center in set(centers) if center in self.center_ids]
+
+    def select(self, centers=None):
+        """Return the cached records in ID order, optionally limited to some centers."""
+        self.refresh()
+        with self._lock:
+            return [self.records[student_id] for student_id in heapq.merge(*self._id_lists(centers))]
+
+    def get(self, student_id):
+        self.refresh()
+        with self._lock:
+            return self.records.get(student_id)
+
+    def get_many(self, student_ids):
+        """Return the records for student_ids, in the given order, skipping unknown IDs."""
+        self.refresh()
+        with self._lock:
+            return [self.records[student_id] for student_id in student_ids if student_id in self.records]
+
+    def page(self, after=None, before=None, centers=None, page_size=PAGE_SIZE):
+        """Keyset page over the cached records ordered by ID: (records, has_previous, has_next)."""
+        self.refresh()
+        with self._lock:
+            runs = []
+            for ids in self._id_lists(centers):
+                # Walk each list from the cursor only, merging the centers' lists lazily
+                if before is not None:
+                    positions = range(bisect.bisect_left(ids, before) - 1, -1, -1)
+                else:
+                    positions = range(bisect.bisect_right(ids, after) if after is not None else 0, len(ids))
+                runs.append(map(ids.__getitem__, positions))
+            # One extra record tells us whether another page exists
+            page_ids = itertools.islice(heapq.merge(*runs, reverse=before is not None), page_size + 1)
+            page = [self.records[student_id] for student_id in page_ids]
+
+        has_more = len(page) > page_size
+        page = page[:page_size]
+        if before is not None:
+            page.reverse()
+            return page, has_more, True
+        return page, after is not None, has_more
+
+
+student_cache = StudentCache(pool)
+change_feed = changefeed.ChangeFeed(pool)
+FEED_KEYS = ["schema", "centers", "students"]  # What cards and charts are built from
+report_queue = ReportQueue()  # Concurrency: REPORT_WORKERS renders machine-wide, REPORT_QUEUE_LIMIT pending jobs per worker; cache: REPORT_CACHE_DIR, REPORT_CACHE_MAX_MB
+
+
+def fetch_student(student_id):
+    """Look up one student by ID, as a StudentRecord (None if there is no such student)."""
+    return student_cache.get(student_id)
+
+
+def fetch_student_page(after=None, before=None, centers=None, page_size=PAGE_SIZE):
+    """Keyset pagination over Student_Data ordered by ID.
+
+    Returns (records, has_previous, has_next); cost depends on page_size, not on the table size.
+    """
+    return student_cache.page(after, before, centers, page_size)
+
+
+def search_students(text, after=None, before=None, centers=None, page_size=PAGE_SIZE):
+    """Keyset page of students whose first name, last name or center start with each word of text.
+
+    Same (records, has_previous, has_next) contract as fetch_student_page, served by the FTS5 index.
+    """
+    expression = search_expression(text)
+    if expression is None:
+        return fetch_student_page(after, before, centers, page_size)
+
+    sql = "SELECT Student_Search.rowid FROM Student_Search"
+    params = [expression]
+    conditions = ["Student_Search MATCH ?"]
+    if centers:
+        sql += " JOIN Student_Data ON Student_Data.ID = Student_Search.rowid"
+        conditions.append(f"Student_Data.Center IN ({', '.join(['?'] * len(centers))})")
+        params.extend(centers)
+    if before is not None:
+        conditions.append("Student_Search.rowid < ?")
+        params.append(before)
+        order = "DESC"
+    else:
+        if after is not None:
+            conditions.append("Student_Search.rowid > ?")
+            params.append(after)
+        order = "ASC"
+    sql += f" WHERE {' AND '.join(conditions)} ORDER BY Student_Search.rowid {order} LIMIT ?"
+    params.append(page_size + 1)  # One extra row tells us whether another page exists
+
+    ids = [row[0] for row in pool.connection().execute(sql, params)]
+    has_more = len(ids) > page_size
+    ids = ids[:page_size]
+    if before is not None:
+        ids.reverse()
+        return student_cache.get_many(ids), has_more, True
+    return student_cache.get_many(ids), after is not None, has_more
+
+
+def page_query(centers, page_size, query="", **cursor):
+    """Build the ?search part of a grid URL."""
+    params = [("q", query)] if query else []
+    params.extend(("center", center) for center in centers or [])
+    if page_size != PAGE_SIZE:
+        params.append(("size", page_size))
+    params.extend((key, value) for key, value in cursor.items())
+    return "?" + urlencode(params) if params else ""
+
+
+def parse_page_query(search):
+    query = parse_qs((search or "").lstrip("?"))
+
+    def as_int(key):
+        try:
+            return int(query[key][0])
+        except (KeyError, ValueError):
+            return None
 
-        # Build the PDF document with the main table and graph image side by side
-        content = [title, Spacer(1, 12), center_info, Spacer(1, 12), progress_heading, Spacer(1, 12)]
+    page_size = min(max(as_int("size") or PAGE_SIZE, 1), MAX_PAGE_SIZE)
+    text = query.get("q", [""])[0]
+    return query.get("center", []), page_size, as_int("after"), as_int("before"), text
 
-        # Add main table and graph image side by side
-        content.append(main_table)
-        content.append(graph_image)
 
-    else:
-        # Build the PDF document with only the main table
-        content = [title, Spacer(1, 12), center_info, Spacer(1, 12), progress_heading, Spacer(1, 12), main_table]
+def center_options():
+    rows = pool.connection().execute("SELECT DISTINCT Center FROM Center_Data").fetchall()
+    return [{"label": row[0], "value": row[0]} for row in rows]
+
+
+def update_filters(centers, text):
+    """Filtering or searching starts again from the first page."""
+    return page_query(centers, PAGE_SIZE, (text or "").strip())
 
-    doc.build(content)
-    pdf_buffer.seek(0)
-    return pdf_buffer
-# Function to filter out columns starting with "Course"
-def filter_course_columns(header):
-    return [col for col in header if "Course" in col]
 
 # Update the display_page function
-@app.callback(
-    [Output('page-content', 'children'),
-     Output('chart-type-dropdown', 'style'),
-     Output('page-heading', 'children')],
-    [Input('url', 'pathname')]
-)
-def display_page(pathname):
-    conn = sqlite3.connect('graph_data.db')
-    cursor=conn.cursor()
-    cursor.execute("SELECT * FROM Student_Data")
-    students= cursor.fetchall()
-    conn.close()
+def display_page(pathname, search=None, _version=None):
+    pathname = local_path(pathname)
+    courses = row_layout().courses
     if pathname == "/":
-        # Display the grid of cards on the first page
+        centers, page_size, after, before, text = parse_page_query(search)
+        students, has_previous, has_next = search_students(text, after, before, centers, page_size)
+
         # Display the grid of cards on the first page
         cards_per_row = 5
         grid_of_cards = [
@@ -152,9 +348,9 @@ def display_page(pathname):
                         dbc.Card(
                             [
                                 dbc.CardHeader(html.A(
-                                    f"{students[j][0]} {students[j][1]}",
-                                    href=f"/student/{j}",
-                                    id={"type": "student-link", "index": j},
+                                    students[j].name,
+                                    href=app_url(f"/student/{students[j].id}"),
+                                    id={"type": "student-link", "index": students[j].id},
                                     style={"color": "inherit", "text-decoration": "none",
                                            "background-color": "#6873af"},
                                 ),
@@ -164,14 +360,12 @@ def display_page(pathname):
                                     }),
                                 dbc.CardBody(
                                     [
-                                        html.P(f"Center: {students[j][2]}"),
+                                        html.P(f"Center: {students[j].center}"),
                                         html.P("Course Progress:"),
                                         html.Ul(
                                             [
-                                                html.Li(
-                                                    f"{filter_course_columns(header)[i]}: {students[j][header.index(filter_course_columns(header)[i])]}%"
-                                                )
-                                                for i in range(len(filter_course_columns(header)))
+                                                html.Li(f"{course}: {progress}%")
+                                                for course, progress in zip(courses, students[j].progress)
                                             ]
                                         ),
                                     ]
@@ -187,18 +381,44 @@ def display_page(pathname):
             for i in range(0, len(students), cards_per_row)  # Increment i by cards_per_row for each new row
         ]
 
-        return grid_of_cards, {'display': 'none'}, "Student Data Display"
+        search_box = dcc.Input(
+            id="student-search",
+            type="search",
+            value=text,
+            debounce=True,
+            placeholder="Search by name or center",
+            style={'width': '400px', 'display': 'block', 'margin': '0 auto 10px auto'},
+        )
+        center_filter = dcc.Dropdown(
+            id="center-filter",
+            options=center_options(),
+            value=centers,
+            multi=True,
+            placeholder="Filter by center",
+            style={'width': '400px', 'margin': '0 auto 20px auto'},
+        )
+        pager = html.Div(
+            [
+                dcc.Link("Previous", href=app_url("/" + page_query(centers, page_size, text, before=students[0].id)),
+                         style={'margin-right': '20px'}) if has_previous and students else None,
+                dcc.Link("Next", href=app_url("/" + page_query(centers, page_size, text, after=students[-1].id)))
+                if has_next and students else None,
+            ],
+            style={'text-align': 'center', 'margin-bottom': '20px'},
+        )
+        if not students:
+            grid_of_cards = [html.P("No students found.", style={'text-align': 'center'})]
+        return [search_box, center_filter, *grid_of_cards, pager], {'display': 'none'}, "Student Data Display"
 
     elif pathname.startswith("/student/"):
         # Display the student details and chart on the second page
         student_index = int(pathname.split("/")[-1])
-        if 0 <= student_index < len(students):
-            student = students[student_index]
-
+        student = fetch_student(student_index)
+        if student:
             student_card = dbc.Card(
                 [
                     dbc.CardHeader(
-                        html.H2(f"{student[0]} {student[1]}", className="card-title", style={'font-size': '1.2em'}),
+                        html.H2(student.name, className="card-title", style={'font-size': '1.2em'}),
                         style={
                             "background-color": "#6873af",
                             "color": "white"
@@ -206,14 +426,14 @@ def display_page(pathname):
                     ),
                     dbc.CardBody(
                         [
-                            html.P(f"Center: {student[2]}", className="card-text", style={'font-size': '1em'}),
+                            html.P(f"Center: {student.center}", className="card-text", style={'font-size': '1em'}),
                             html.P("Course Progress:", className="card-text", style={'font-size': '1em'}),
-                            html.Ul([html.Li(f"{filter_course_columns(header)[i]}: {student[header.index(filter_course_columns(header)[i])]}%", className="card-text",
-                                             style={'font-size': '1em'}) for i in range(len(filter_course_columns(header)))],
+                            html.Ul([html.Li(f"{course}: {progress}%", className="card-text",
+                                             style={'font-size': '1em'}) for course, progress in zip(courses, student.progress)],
                                     ),
                             html.A(
                                 dbc.Button("Download Report", id="download-report-button", color="success", className="mt-3"),
-                                href=f"/download-report/{student_index}",
+                                href=app_url(f"/download-report/{student_index}"),
                                 id="download-link"
                             ),
                         ]
@@ -224,7 +444,7 @@ def display_page(pathname):
             chart_col = dbc.Col(
                 id='chart-col',
                 children=[
-                    html.H3(f"Details for {student[0]} {student[1]}",
+                    html.H3(f"Details for {student.name}",
                             style={'text-align': 'center', 'margin-bottom': '20px'}),
                     dbc.Card(
                         children=[
@@ -271,75 +491,61 @@ def display_page(pathname):
 
 # Define the callback to update the chart based on the dropdown value and selected student
 # Modify the update_chart callback function
-@app.callback(
-    [Output('chart', 'figure'),
-     Output('download-link', 'href')],
-    [Input('url', 'pathname'),
-     Input('chart-type-dropdown', 'value')]
-)
-def update_chart(pathname, selected_chart_type):
+def update_chart(pathname, selected_chart_type, _version=None):
     fig = go.Figure()
+    pathname = local_path(pathname)
 
     if pathname.startswith("/student/"):
         # Extract student index from the URL
         student_index = int(pathname.split("/")[-1])
 
         # Query the database for the specific student
-        with sqlite3.connect('graph_data.db') as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM Student_Data WHERE ID=?", (student_index,))
-            student = cursor.fetchone()
+        student = fetch_student(student_index)
 
         if student:
-            course_columns = filter_course_columns(header)
-            course_progress = [student[header.index(course)] for course in course_columns]
+            course_columns = list(row_layout().courses)
+            course_progress = list(student.progress)
 
             # Plot the appropriate graph type
             if selected_chart_type == 'bar':
                 fig.add_trace(go.Bar(
                     x=course_columns,
                     y=course_progress,
-                    name=f"{student[0]} {student[1]}",
+                    name=student.name,
                 ))
             elif selected_chart_type == 'line':
                 fig.add_trace(go.Scatter(
                     x=course_columns,
                     y=course_progress,
                     mode='lines+markers',
-                    name=f"{student[0]} {student[1]}",
+                    name=student.name,
                 ))
 
             # Update the download link with the current student's PDF
-            download_link = f"/download-report/{student_index}?chart=true"
+            download_link = app_url(f"/download-report/{student_index}?chart=true")
             return fig, download_link
 
     # Default empty figure and no link
     return fig, ""
 # Define the callback to handle the download link with chart option
-@app.server.route("/download-report/<int:student_index>")
+def report_student(student):
+    """Convert a cached StudentRecord into the plain data the report workers render."""
+    return ReportStudent(student.first_name, student.last_name, student.center, row_layout().courses, student.progress)
+
+
 def download_report(student_index):
-    conn = sqlite3.connect('graph_data.db')
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM Student_Data WHERE ID=?", (student_index,))
-    student = cursor.fetchone()
-    conn.close()
-    if 0 <= student_index < len(students):
-        student = students[student_index]
+    student = fetch_student(student_index)
+    if student:
         include_chart = flask.request.args.get('chart') == 'true'
 
         try:
-            # Generate the Plotly figure for the selected student
-            fig = go.Figure()
-            student_data = student
-            fig.add_trace(go.Bar(x=header[3:], y=student_data[2:], name=f"{student_data[0]} {student_data[1]}"))
-
-            # Generate the PDF with the selected student's details and chart
-            pdf_buffer = generate_pdf(student, fig if include_chart else None)
+            # Render in the report process pool; this thread only waits for the file
+            pdf_path = report_queue.render(report_student(student), include_chart)
 
             # Create a downloadable file
             return send_file(
-                pdf_buffer,
-                download_name=f"{student[0]}_{student[1]}_report.pdf",
+                pdf_path,
+                download_name=f"{student.first_name}_{student.last_name}_report.pdf",
                 mimetype="application/pdf",
             )
         except Exception as e:
@@ -348,59 +554,213 @@ def download_report(student_index):
 
     else:
         return "Invalid student index."
-app.layout = html.Div([
-    dcc.Location(id="url", refresh=False),
-    html.Div([
-        dcc.Interval(
-            id='interval-component',
-            interval=5 * 60 * 1000,  # Update every 5 minutes (in milliseconds)
-            n_intervals=0
-        ),
-        html.H3(id="page-heading", children="Details for ...", style={'text-align': 'center', 'margin': '0', 'padding': '20px', 'position': 'relative', 'margin-top': '0'}),
-        html.Div(id="page-content", className="row"),
-
-        # Dropdown for chart type
-        dcc.Dropdown(
-            id='chart-type-dropdown',
-            options=[
-                {'label': 'Bar Chart', 'value': 'bar'},
-                {'label': 'Line Chart', 'value': 'line'},
-            ],
-            value='bar',
-            clearable=False,
-            style={'display': 'none'}
-        ),
-        html.A(
-            dbc.Button("Download PDF", id="download-pdf-button", color="success", className="mt-3", style={'display': 'none'}),
-            href="#",
-            id="download-pdf-link"
-        ),
-    ], style={'background-color': page_background_color, 'height': '100vh', 'margin': '0', 'padding': '0', 'overflow': 'auto'})
-])
+
+
+def submit_report(student_index):
+    """Queue a report card; poll the returned status URL, then fetch the result URL."""
+    student = fetch_student(student_index)
+    if not student:
+        return flask.jsonify(error="Invalid student index."), 404
+    job_id = report_queue.submit(report_student(student), flask.request.args.get('chart') == 'true')
+    if job_id is None:
+        return flask.jsonify(error="Report queue is full, try again later."), 503
+    return flask.jsonify(
+        job=job_id,
+        status_url=app_url(f"/reports/jobs/{job_id}"),
+        result_url=app_url(f"/reports/jobs/{job_id}/result"),
+    ), 202
+
+
+def report_status(job_id):
+    try:
+        return flask.jsonify(report_queue.status(job_id))
+    except KeyError:
+        return flask.jsonify(error="Unknown report job."), 404
+
+
+def report_result(job_id):
+    try:
+        status = report_queue.status(job_id)
+    except KeyError:
+        return flask.jsonify(error="Unknown report job."), 404
+    if status["status"] != "done":
+        return flask.jsonify(status), 409
+    name = status["student"].replace(" ", "_")
+    return send_file(report_queue.result_path(job_id), download_name=f"{name}_report.pdf", mimetype="application/pdf")
+
+
+def bulk_reports():
+    """Stream report cards for some centers (?center=, repeatable) or for every student as a ZIP."""
+    centers = flask.request.args.getlist('center')
+    students = student_cache.select(centers)
+    if not students:
+        return flask.jsonify(error="No students found."), 404
+
+    items = (
+        (safe_filename(f"{student.id}_{student.first_name}_{student.last_name}") + ".pdf", report_student(student))
+        for student in students
+    )
+    archive = report_queue.stream_zip(items, flask.request.args.get('chart') == 'true')
+    name = safe_filename("_".join(centers) if centers else "all_students")
+    return flask.Response(
+        archive,
+        mimetype="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{name}_reports.zip"'},
+    )
+
+
+def search_api():
+    """JSON search: ?q=, ?center= (repeatable), ?size= and the ?after= cursor from the previous page."""
+    centers, page_size, after, _before, text = parse_page_query(flask.request.query_string.decode())
+    students, _has_previous, has_next = search_students(text, after, None, centers, page_size)
+    return flask.jsonify(
+        students=[
+            {"id": student.id, "first_name": student.first_name, "last_name": student.last_name,
+             "center": student.center}
+            for student in students
+        ],
+        next=app_url("/api/students/search" + page_query(centers, page_size, text, after=students[-1].id))
+        if has_next else None,
+    )
+
+
+def export_table(name, fmt):
+    """Stream /export/students.csv (or .xlsx, or centers.*); ?center= and ?course= are repeatable filters."""
+    table = EXPORT_TABLES.get(name)
+    if table is None or fmt not in ("csv", "xlsx"):
+        return flask.jsonify(error="Unknown export."), 404
+    try:
+        columns = export_columns('graph_data.db', table, flask.request.args.getlist('course'))
+    except ValueError as e:
+        return flask.jsonify(error=str(e)), 400
+
+    rows = export_rows('graph_data.db', table, columns, flask.request.args.getlist('center'))
+    if fmt == "csv":
+        body, mimetype = stream_csv(rows), "text/csv"
+    else:
+        body, mimetype = stream_xlsx(rows, table), "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    return flask.Response(
+        body,
+        mimetype=mimetype,
+        headers={"Content-Disposition": f'attachment; filename="{name}.{fmt}"'},
+    )
+
+
+def warm_report_cache():
+    """Pre-render report cards (?center=, repeatable; ?chart=true) in the background, e.g. after a bulk import."""
+    students = [report_student(student) for student in student_cache.select(flask.request.args.getlist('center'))]
+    include_chart = flask.request.args.get('chart') == 'true'
+    threading.Thread(target=report_queue.warm, args=(students, include_chart), daemon=True).start()
+    return flask.jsonify(students=len(students)), 202
+
+
+def report_cache_stats():
+    return flask.jsonify(report_queue.cache.stats())
+
+
+def safe_filename(name):
+    return re.sub(r"[^\w.-]+", "_", str(name))
+
+
+def build_layout():
+    return html.Div([
+        dcc.Location(id="url", refresh=False),
+        html.Div([
+            *changefeed.components(change_feed, FEED_KEYS),  # Cards and charts refetch only when the data changed
+            html.H3(id="page-heading", children="Details for ...", style={'text-align': 'center', 'margin': '0', 'padding': '20px', 'position': 'relative', 'margin-top': '0'}),
+            html.Div(id="page-content", className="row"),
+
+            # Dropdown for chart type
+            dcc.Dropdown(
+                id='chart-type-dropdown',
+                options=[
+                    {'label': 'Bar Chart', 'value': 'bar'},
+                    {'label': 'Line Chart', 'value': 'line'},
+                ],
+                value='bar',
+                clearable=False,
+                style={'display': 'none'}
+            ),
+            html.A(
+                dbc.Button("Download PDF", id="download-pdf-button", color="success", className="mt-3", style={'display': 'none'}),
+                href="#",
+                id="download-pdf-link"
+            ),
+        ], style={'background-color': page_background_color, 'height': '100vh', 'margin': '0', 'padding': '0', 'overflow': 'auto'})
+    ])
 
 
 # Define the callback to update the download link and make it visible
-@app.callback(
-    Output('download-pdf-link', 'href'),
-    [Input('url', 'pathname'),
-     Input('chart-type-dropdown', 'value')]
-)
 def update_pdf_link(pathname, selected_chart_type):
+    pathname = local_path(pathname)
     if selected_chart_type and pathname.startswith("/student/"):
         student_index = int(pathname.split("/")[-1])
-        download_link = f"/download-report/{student_index}?chart=true"
+        download_link = app_url(f"/download-report/{student_index}?chart=true")
         return download_link
 
     raise PreventUpdate  # This prevents the callback from updating the download link on initial page load
-@app.callback(
-    Output('hidden-div', 'children'),
-    [Input('interval-component', 'n_intervals')],
-    allow_duplicate=True
-)
-def update_data(n_intervals):
-    # Update your data here
-    return time.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def prepare_database():
+    try:
+        # mode=rw: a missing database is reported, not created empty
+        conn = sqlite3.connect('file:graph_data.db?mode=rw', uri=True)
+        ensure_wal(conn)
+        ensure_student_indexes(conn)
+        ensure_student_change_log(conn)
+        ensure_student_search(conn)
+        conn.commit()
+        conn.close()
+    except Exception as e:
+        print(f"Error preparing student indexes: {e}")
+
+
+def create_app(requests_pathname_prefix="/"):
+    """Application factory: build the Dash app and register its callbacks and routes."""
+    app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP], requests_pathname_prefix=requests_pathname_prefix)
+    app.config.suppress_callback_exceptions = True  # Suppress callback exceptions
+    app.layout = build_layout  # Served per page load, with the current data version
+    prepare_database()
+
+    app.callback(
+        [Output('page-content', 'children'),
+         Output('chart-type-dropdown', 'style'),
+         Output('page-heading', 'children')],
+        [Input('url', 'pathname'),
+         Input('url', 'search'),
+         Input('data-version', 'data')]
+    )(display_page)
+    app.callback(
+        Output('url', 'search'),
+        [Input('center-filter', 'value'),
+         Input('student-search', 'value')],
+        prevent_initial_call=True
+    )(update_filters)
+    app.callback(
+        [Output('chart', 'figure'),
+         Output('download-link', 'href')],
+        [Input('url', 'pathname'),
+         Input('chart-type-dropdown', 'value'),
+         Input('data-version', 'data')]
+    )(update_chart)
+    app.callback(
+        Output('download-pdf-link', 'href'),
+        [Input('url', 'pathname'),
+         Input('chart-type-dropdown', 'value')]
+    )(update_pdf_link)
+    changefeed.watch(app, change_feed, FEED_KEYS)
+    app.server.route("/download-report/<int:student_index>")(download_report)
+    app.server.route("/reports/<int:student_index>", methods=["POST"])(submit_report)
+    app.server.route("/reports/jobs/<job_id>")(report_status)
+    app.server.route("/reports/jobs/<job_id>/result")(report_result)
+    app.server.route("/api/students/search")(search_api)
+    app.server.route("/export/<name>.<fmt>")(export_table)
+    app.server.route("/reports/bulk.zip")(bulk_reports)
+    app.server.route("/reports/cache/warm", methods=["POST"])(warm_report_cache)
+    app.server.route("/stats/report-cache")(report_cache_stats)
+    return app
+
 
 # Run the app
 if __name__ == '__main__':
-    app.run_server(debug=True, port='8052')
+    create_app().run_server(debug=True, port='8052')
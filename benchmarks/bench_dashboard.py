@@ -0,0 +1,167 @@
+"""Measure Dashboard.py callback latency and peak memory.
+
+Each callback (BarGraph.update, PieLineCharts.update, DropdownComponent.update) is
+timed both as a direct method call and through the Dash HTTP endpoint via Flask's
+test client. Results can be saved as JSON and compared against an earlier run:
+
+    python benchmarks/bench_dashboard.py --db bench.db --output after.json --compare before.json
+"""
+import argparse
+import importlib.util
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def load_dashboard_module():
+    spec = importlib.util.spec_from_file_location("Dashboard", os.path.join(ROOT, "Dashboard.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def percentiles(samples):
+    """Return p50/p95/p99 in milliseconds."""
+    if len(samples) < 2:
+        samples = samples * 2
+    cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    return {"p50": cuts[49] * 1000, "p95": cuts[94] * 1000, "p99": cuts[98] * 1000}
+
+
+def dash_request(outputs, inputs):
+    """Build the JSON body Dash's renderer posts to /_dash-update-component."""
+    output_specs = [{"id": component_id, "property": prop} for component_id, prop in outputs]
+    if len(outputs) == 1:
+        output = f"{outputs[0][0]}.{outputs[0][1]}"
+        output_specs = output_specs[0]
+    else:
+        output = ".." + "...".join(f"{component_id}.{prop}" for component_id, prop in outputs) + ".."
+    return {
+        "output": output,
+        "outputs": output_specs,
+        "inputs": [{"id": component_id, "property": prop, "value": value} for component_id, prop, value in inputs],
+        "changedPropIds": [f"{inputs[0][0]}.{inputs[0][1]}"],
+    }
+
+
+def scenarios(dashboard, selection_size, rng):
+    """Yield (name, direct call, HTTP body) triples for one random selection."""
+    rows, columns = dashboard.snapshot.refresh()
+    all_centers = [row[columns.index("Center")] for row in rows]
+    courses = dashboard.bar_graph.courses.course_columns("Center_Data")
+    centers = rng.sample(all_centers, min(selection_size, len(all_centers)))
+    course = rng.choice(courses)
+
+    yield (
+        "BarGraph.update",
+        lambda: dashboard.bar_graph.update(course, centers),
+        dash_request([("graph", "figure")], [("Course_dropdown", "value", course), ("center-checklist", "value", centers)]),
+    )
+    yield (
+        "PieLineCharts.update",
+        lambda: dashboard.pie_line_charts.update(centers, course),
+        dash_request(
+            [("pie-chart", "figure"), ("line-chart", "figure")],
+            [("center-checklist", "value", centers), ("Course_dropdown", "value", course)],
+        ),
+    )
+    yield (
+        "DropdownComponent.update",
+        lambda: dashboard.dropdown.update(centers),
+        dash_request([("Course_dropdown", "options")], [("center-checklist", "value", centers)]),
+    )
+
+
+def run(db_file, iterations, selection_sizes, use_figure_cache=True, seed=0):
+    module = load_dashboard_module()
+    dashboard = module.DashboardApp(db_file)
+    if not use_figure_cache:
+        # A zero-sized cache evicts every entry immediately, so each call rebuilds its figures
+        dashboard.figure_cache.max_entries = 0
+    client = dashboard.app.server.test_client()
+    rng = random.Random(seed)
+
+    results = {}
+    for size in selection_sizes:
+        timings = {}
+        for _ in range(iterations):
+            # Direct and HTTP calls draw separate selections so neither only measures the other's cache hits
+            for name, call, _body in scenarios(dashboard, size, rng):
+                started = time.perf_counter()
+                call()
+                timings.setdefault(f"{name} [direct]", []).append(time.perf_counter() - started)
+
+            for name, _call, body in scenarios(dashboard, size, rng):
+                started = time.perf_counter()
+                response = client.post("/_dash-update-component", json=body)
+                timings.setdefault(f"{name} [http]", []).append(time.perf_counter() - started)
+                if response.status_code not in (200, 204):
+                    raise RuntimeError(f"{name} returned HTTP {response.status_code}: {response.get_data(as_text=True)[:200]}")
+
+        # Peak memory is measured in a separate pass so tracing does not skew the latencies
+        for name, call, _body in scenarios(dashboard, size, rng):
+            tracemalloc.start()
+            call()
+            _current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            results.setdefault(str(size), {}).setdefault(f"{name} [direct]", {})["peak_kib"] = peak / 1024
+
+        for name, samples in timings.items():
+            results.setdefault(str(size), {}).setdefault(name, {}).update(percentiles(samples))
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_report(results, baseline=None):
+    print(f"{'centers':>8}  {'callback':<36}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'peak KiB':>12}")
+    for size, callbacks in results.items():
+        for name, stats in callbacks.items():
+            line = f"{size:>8}  {name:<36}{stats['p50']:>10.2f}{stats['p95']:>10.2f}{stats['p99']:>10.2f}"
+            line += f"{stats['peak_kib']:>12.1f}" if "peak_kib" in stats else f"{'':>12}"
+            before = (baseline or {}).get(size, {}).get(name)
+            if before:
+                change = (stats["p95"] - before["p95"]) / before["p95"] * 100 if before["p95"] else 0.0
+                line += f"   p95 {change:+.1f}% vs baseline"
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="graph_data.db", help="database to benchmark (see generate_data.py)")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--selection-sizes", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--no-figure-cache", action="store_true", help="rebuild figures on every call")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="JSON file from an earlier run to compare against")
+    args = parser.parse_args()
+
+    results = run(args.db, args.iterations, args.selection_sizes, not args.no_figure_cache, args.seed)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+    print_report(results, baseline)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"revision": git_revision(), "db": args.db, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
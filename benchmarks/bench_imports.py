@@ -0,0 +1,98 @@
+"""Profile app start-up with ``python -X importtime`` and check it against a budget.
+
+Each app module is imported and its create_app() factory called in a fresh
+interpreter. The report lists total import time, factory time and the heaviest
+top-level imports:
+
+    python benchmarks/bench_imports.py --budget-ms 1500 --output imports.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APPS = ["Dashboard.py", "Student Form.py", "Student Records.py"]
+
+# Runs in the child interpreter; file names contain spaces, so modules are loaded by path
+PROBE = """
+import importlib.util, json, sys, time
+sys.path.insert(0, {root!r})
+started = time.perf_counter()
+spec = importlib.util.spec_from_file_location("app_module", {path!r})
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+imported = time.perf_counter()
+module.create_app()
+created = time.perf_counter()
+print(json.dumps({{"import_ms": (imported - started) * 1000, "factory_ms": (created - imported) * 1000}}))
+"""
+
+
+def parse_importtime(stderr):
+    """Return {module: cumulative microseconds} for top-level imports in -X importtime output."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if name.startswith("  "):
+            continue  # Nested import, already counted in its parent's cumulative time
+        modules[name.strip()] = int(cumulative_us)
+    return modules
+
+
+def profile(app, python=sys.executable):
+    path = os.path.join(ROOT, app)
+    result = subprocess.run(
+        [python, "-X", "importtime", "-c", PROBE.format(root=ROOT, path=path)],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    modules = parse_importtime(result.stderr)
+    timings["heaviest"] = sorted(((us / 1000, name) for name, us in modules.items()), reverse=True)[:10]
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, help="fail if import + factory time of any app exceeds this")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="JSON file from an earlier run to compare against")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    results = {}
+    over_budget = []
+    for app in APPS:
+        timings = results[app] = profile(app)
+        total = timings["import_ms"] + timings["factory_ms"]
+        line = f"{app:<22} import {timings['import_ms']:8.1f} ms   create_app {timings['factory_ms']:8.1f} ms"
+        if app in baseline:
+            before = baseline[app]["import_ms"] + baseline[app]["factory_ms"]
+            line += f"   total {total - before:+.1f} ms vs baseline"
+        print(line)
+        for ms, name in timings["heaviest"]:
+            print(f"    {ms:8.1f} ms  {name}")
+        if args.budget_ms is not None and total > args.budget_ms:
+            over_budget.append(f"{app}: {total:.1f} ms > {args.budget_ms:.1f} ms")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if over_budget:
+        print("Start-up budget exceeded:\n  " + "\n  ".join(over_budget))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
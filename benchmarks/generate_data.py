@@ -0,0 +1,86 @@
+"""Fill a graph_data.db-style database with synthetic centers, students and courses.
+
+Example:
+    python benchmarks/generate_data.py --db bench.db --centers 200 --students 100000 --courses 12
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import ensure_center_rollups, ensure_student_identity
+
+
+def course_names(count):
+    """Course A, Course B, ..., Course Z, Course AA, ..."""
+    names = []
+    for i in range(count):
+        label = ""
+        i += 1
+        while i:
+            i, remainder = divmod(i - 1, 26)
+            label = chr(ord("A") + remainder) + label
+        names.append(f"Course {label}")
+    return names
+
+
+def generate(db_file, centers, students, courses, na_rate=0.05, seed=0, batch_size=10000):
+    rng = random.Random(seed)
+    course_fields = course_names(courses)
+    center_names = [f"Center {i + 1}" for i in range(centers)]
+
+    conn = sqlite3.connect(db_file)
+    cursor = conn.cursor()
+    cursor.execute("DROP TABLE IF EXISTS Center_Data")
+    cursor.execute("DROP TABLE IF EXISTS Student_Data")
+    cursor.execute("DROP TABLE IF EXISTS Center_Rollup")
+    cursor.execute(
+        "CREATE TABLE Center_Data (Center TEXT, " + ", ".join(f"`{field}` REAL DEFAULT 0" for field in course_fields) + ")"
+    )
+    cursor.execute(
+        "CREATE TABLE Student_Data (`First Name` TEXT, `Last Name` TEXT, Center TEXT, "
+        + ", ".join(f"`{field}`" for field in course_fields)
+        + ", ID INTEGER PRIMARY KEY)"
+    )
+    cursor.executemany("INSERT INTO Center_Data (Center) VALUES (?)", [(name,) for name in center_names])
+
+    placeholders = ", ".join(["?"] * (4 + len(course_fields)))
+    query = f"INSERT INTO Student_Data VALUES ({placeholders})"
+    for start in range(0, students, batch_size):
+        rows = []
+        for student_id in range(start, min(start + batch_size, students)):
+            progress = ["N.A" if rng.random() < na_rate else rng.randint(0, 100) for _ in course_fields]
+            rows.append((f"First{student_id}", f"Last{student_id}", rng.choice(center_names), *progress, student_id))
+        cursor.executemany(query, rows)
+
+    # Center_Data is derived from Student_Data, exactly as the entry form keeps it
+    ensure_center_rollups(conn)
+    ensure_student_identity(conn)
+    conn.commit()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="graph_data.db", help="database file to (re)create")
+    parser.add_argument("--centers", type=int, default=50)
+    parser.add_argument("--students", type=int, default=10000)
+    parser.add_argument("--courses", type=int, default=5)
+    parser.add_argument("--na-rate", type=float, default=0.05, help="share of progress values stored as N.A")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    generate(args.db, args.centers, args.students, args.courses, args.na_rate, args.seed)
+    print(
+        f"Wrote {args.centers} centers, {args.students} students and {args.courses} courses "
+        f"to {args.db} in {time.perf_counter() - started:.2f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""A cheap change feed so pages refetch only when the database actually changed."""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+
+import flask
+from dash import dcc, Input, Output, State
+
+CHANGE_POLL_MS = int(os.environ.get("CHANGE_POLL_MS", 5000))
+
+
+def _digest(value):
+    return hashlib.sha1(repr(value).encode()).hexdigest()[:16]
+
+
+class ChangeFeed:
+    """Versions of the parts of graph_data.db that pages display.
+
+    PRAGMA data_version says whether anything was committed since the last look; only then
+    are the (small) versions recomputed. They are derived from the data itself, so every
+    worker process reports the same versions for the same database state.
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+        self._lock = threading.Lock()
+        self._data_version = None
+        self._versions = None
+
+    def versions(self):
+        """{"schema", "centers", "center_data", "students"} -> opaque version strings."""
+        data_version = self.pool.data_version()
+        with self._lock:
+            if data_version != self._data_version:
+                self._versions = self._compute()
+                self._data_version = data_version
+            return dict(self._versions)
+
+    def _compute(self):
+        conn = self.pool.connection()
+        conn.execute("BEGIN")  # One snapshot for all the parts
+        try:
+            center_data = conn.execute("SELECT * FROM Center_Data ORDER BY Center").fetchall()
+            try:
+                last_change = conn.execute("SELECT MAX(Seq) FROM Student_Changes").fetchone()[0]
+            except sqlite3.OperationalError:  # No change log yet: fall back to a count
+                last_change = conn.execute("SELECT COUNT(*) FROM Student_Data").fetchone()[0]
+            students = (conn.execute("SELECT MAX(ID) FROM Student_Data").fetchone()[0], last_change)
+            return {
+                "schema": str(conn.execute("PRAGMA schema_version").fetchone()[0]),
+                "centers": _digest([row[0] for row in center_data]),
+                "center_data": _digest(center_data),
+                "students": _digest(students),
+            }
+        finally:
+            conn.execute("COMMIT")
+
+
+def components(feed, keys, store_id="data-version", interval_id="change-poll"):
+    """The layout pieces a page needs to follow the feed, for keys as passed to watch.
+
+    Call it when the page is served (from a layout function): the store starts at the
+    current version, so the first poll changes nothing and callbacks taking the store as
+    an Input run once per page load rather than twice.
+    """
+    try:
+        version = ":".join(feed.versions()[key] for key in keys)
+    except sqlite3.Error:  # E.g. no database yet: the first poll fills the store in
+        version = None
+    return [
+        dcc.Interval(id=interval_id, interval=CHANGE_POLL_MS, n_intervals=0),
+        dcc.Store(id=store_id, data=version),
+    ]
+
+
+def watch(app, feed, keys, store_id="data-version", interval_id="change-poll"):
+    """Serve the feed at /api/version and keep store_id's data at the current version of keys.
+
+    Polling happens in the browser against the plain Flask route; the store (and so any
+    callback that takes it as an Input) only changes when one of keys changed.
+    """
+    def version():
+        return flask.jsonify(feed.versions())
+
+    app.server.route("/api/version", endpoint=f"version_{store_id}")(version)
+    url = app.config.requests_pathname_prefix + "api/version"
+    app.clientside_callback(
+        """
+        function(n, current) {
+            return fetch(%s).then(function(response) { return response.json(); }).then(function(versions) {
+                var version = %s.map(function(key) { return versions[key]; }).join(":");
+                return version === current ? window.dash_clientside.no_update : version;
+            }).catch(function() { return window.dash_clientside.no_update; });
+        }
+        """ % (json.dumps(url), json.dumps(list(keys))),
+        Output(store_id, "data"),
+        Input(interval_id, "n_intervals"),
+        State(store_id, "data"),
+    )
@@ -0,0 +1,505 @@
+import itertools
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+import weakref
+from collections import deque
+from concurrent.futures import Future
+
+_monitor_serial = itertools.count()
+BUSY_TIMEOUT_MS = 5000
+
+
+class _ConnectionHolder:
+    """Thread-local slot whose finalizer closes the connection when its thread exits."""
+    __slots__ = ("conn", "__weakref__")
+
+    def __init__(self, conn):
+        self.conn = conn
+
+
+class ConnectionPool:
+    """Keeps one long-lived, read-only SQLite connection per live thread."""
+
+    def __init__(self, db_file, mmap_size=256 * 1024 * 1024, cache_size=-16000):
+        self.db_file = db_file
+        self.mmap_size = mmap_size
+        self.cache_size = cache_size  # Negative values are KiB, as in PRAGMA cache_size
+        self._reset()
+        self.hits = 0
+        self.misses = 0
+
+    def _reset(self):
+        # Connections must never cross a fork (e.g. a WSGI server preloading the app),
+        # so state is tied to the process that created it.
+        self._pid = os.getpid()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+        self._monitor = None
+
+    def _check_process(self):
+        if self._pid != os.getpid():
+            self._reset()
+
+    def _open(self):
+        conn = sqlite3.connect(self.db_file, check_same_thread=False)
+        conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+        conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        conn.execute(f"PRAGMA cache_size = {int(self.cache_size)}")
+        conn.execute("PRAGMA query_only = ON")
+        return conn
+
+    def connection(self):
+        """Return the calling thread's connection, opening it on first use."""
+        self._check_process()
+        holder = getattr(self._local, "holder", None)
+        if holder is not None:
+            with self._lock:
+                self.hits += 1
+            return holder.conn
+
+        conn = self._open()
+        holder = _ConnectionHolder(conn)
+        self._local.holder = holder
+        with self._lock:
+            self.misses += 1
+            self._connections.append(conn)
+        # Servers that start a thread per request (e.g. the threaded debug server) would
+        # otherwise leave one open connection behind per request
+        weakref.finalize(holder, self._release, conn, self._pid)
+        return conn
+
+    def _release(self, conn, pid):
+        if pid != os.getpid():
+            return  # Inherited across a fork; closing it here could drop the parent's locks
+        with self._lock:
+            if conn in self._connections:
+                self._connections.remove(conn)
+        conn.close()
+
+    def data_version(self):
+        """Return an opaque token that changes whenever another connection commits a write."""
+        # data_version is only comparable on a single connection, so all threads share one
+        # and the token carries which monitor (process and connection) produced the value.
+        self._check_process()
+        with self._lock:
+            if self._monitor is None:
+                self._monitor = self._open()
+                self._monitor_id = (self._pid, next(_monitor_serial))
+            return self._monitor_id, self._monitor.execute("PRAGMA data_version").fetchone()[0]
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "open_connections": len(self._connections),
+                "hit_ratio": self.hits / total if total else 0.0,
+            }
+
+    def close_all(self):
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+            if self._monitor is not None:
+                self._monitor.close()
+                self._monitor = None
+        self._local = threading.local()
+
+
+def ensure_wal(conn):
+    """Switch the database to WAL journaling (persistent), so readers never wait on the writer."""
+    conn.execute("PRAGMA journal_mode = WAL")
+
+
+class WriteQueue:
+    """One writer thread owning the process's only write connection.
+
+    Callers queue functions of a connection; the writer runs up to max_batch of them in
+    one transaction (each inside its own savepoint, so one failure does not sink the
+    rest) and commits once, amortizing the fsync across a burst of submissions.
+    """
+
+    def __init__(self, db_file, max_batch=32, batch_wait=0.002):
+        self.db_file = db_file
+        self.max_batch = max_batch
+        self.batch_wait = batch_wait  # Seconds to wait for company once a write arrives
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self.batches = 0
+        self.writes = 0
+        self.failures = 0
+        self.commit_ms = deque(maxlen=1000)
+
+    def submit(self, fn, *args):
+        """Queue fn(conn, *args); the returned Future resolves once its batch has committed."""
+        future = Future()
+        with self._lock:
+            # The writer thread does not survive a fork (or a failure), so start one as needed
+            if self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._pid = os.getpid()
+                threading.Thread(target=self._run, args=(self._queue,), name="sqlite-writer", daemon=True).start()
+            self._queue.put((fn, args, future))
+        return future
+
+    def run(self, fn, *args, timeout=30):
+        """Queue fn(conn, *args) and wait for its (committed) result."""
+        return self.submit(fn, *args).result(timeout)
+
+    def _open(self):
+        conn = sqlite3.connect(self.db_file, isolation_level=None, check_same_thread=False)
+        conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+        ensure_wal(conn)
+        conn.execute("PRAGMA synchronous = NORMAL")  # Durable across crashes in WAL mode; cheaper commits
+        return conn
+
+    def _run(self, jobs):
+        conn = None
+        batch = []
+        try:
+            conn = self._open()
+            while True:
+                batch = [jobs.get()]
+                deadline = time.perf_counter() + self.batch_wait
+                while len(batch) < self.max_batch:
+                    try:
+                        batch.append(jobs.get(timeout=max(deadline - time.perf_counter(), 0)))
+                    except queue.Empty:
+                        break
+                self._write(conn, batch)
+                batch = []
+        except Exception as e:
+            # E.g. "database is locked" while switching to WAL: fail what is queued rather
+            # than leave callers waiting, and let the next submit start a fresh writer
+            with self._lock:
+                if self._queue is jobs:
+                    self._queue = None
+                    self._pid = None
+                while True:
+                    try:
+                        batch.append(jobs.get_nowait())
+                    except queue.Empty:
+                        break
+            for _fn, _args, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            with self._lock:
+                self.failures += len(batch)
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def _write(self, conn, batch):
+        started = time.perf_counter()
+        results = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for fn, args, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                conn.execute("SAVEPOINT submission")
+                try:
+                    results.append((future, fn(conn, *args), None))
+                    conn.execute("RELEASE submission")
+                except Exception as e:
+                    conn.execute("ROLLBACK TO submission")
+                    conn.execute("RELEASE submission")
+                    results.append((future, None, e))
+            conn.execute("COMMIT")
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            results = [(future, None, e) for _fn, _args, future in batch if not future.done()]
+
+        elapsed = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self.batches += 1
+            self.writes += len(results)
+            self.failures += sum(1 for _future, _result, error in results if error is not None)
+            self.commit_ms.append(elapsed)
+        for future, result, error in results:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self.commit_ms)
+            return {
+                "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+                "batches": self.batches,
+                "writes": self.writes,
+                "failures": self.failures,
+                "mean_batch_size": self.writes / self.batches if self.batches else 0.0,
+                "commit_ms_p50": latencies[len(latencies) // 2] if latencies else None,
+                "commit_ms_p95": latencies[int(len(latencies) * 0.95)] if latencies else None,
+                "commit_ms_max": latencies[-1] if latencies else None,
+            }
+
+
+# Student_Data columns that identify a student rather than hold course progress
+IDENTITY_COLUMNS = ("ID", "First Name", "Last Name", "Center")
+
+
+class CourseRegistry:
+    """Caches table columns, invalidated only when PRAGMA schema_version changes."""
+
+    def __init__(self, db_file):
+        self.db_file = db_file
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self._schema_version = None
+        self._columns = {}
+
+    def columns(self, table):
+        """Return every column of table, in table order."""
+        with self._lock:
+            if self._conn is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._conn = sqlite3.connect(self.db_file, check_same_thread=False)
+            version = self._conn.execute("PRAGMA schema_version").fetchone()[0]
+            if version != self._schema_version:
+                self._columns = {}
+                self._schema_version = version
+            if table not in self._columns:
+                self._columns[table] = _table_columns(self._conn, table)
+            return list(self._columns[table])
+
+    def course_columns(self, table="Student_Data"):
+        """Return the course (category) columns of table, i.e. everything but the identity columns."""
+        return [column for column in self.columns(table) if column not in IDENTITY_COLUMNS]
+
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+
+def get_course_registry(db_file="graph_data.db"):
+    """Return the process-wide CourseRegistry for db_file."""
+    with _registries_lock:
+        if db_file not in _registries:
+            _registries[db_file] = CourseRegistry(db_file)
+        return _registries[db_file]
+
+
+def ensure_student_indexes(conn):
+    """Index Student_Data for the keyset-paginated, center-filtered record grid."""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_student_center_id ON Student_Data (Center, ID)")
+
+
+def ensure_student_identity(conn):
+    """Make (First Name, Last Name) a unique key, as the entry form already treats it.
+
+    Raises sqlite3.IntegrityError naming the duplicated students if existing rows break it.
+    """
+    try:
+        conn.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_student_identity ON Student_Data (`First Name`, `Last Name`)"
+        )
+    except sqlite3.IntegrityError:
+        duplicates = conn.execute(
+            "SELECT `First Name`, `Last Name` FROM Student_Data GROUP BY `First Name`, `Last Name` "
+            "HAVING COUNT(*) > 1 LIMIT 10"
+        ).fetchall()
+        names = ", ".join(f"{first} {last}" for first, last in duplicates)
+        raise sqlite3.IntegrityError(f"Duplicate students prevent a unique name index: {names}") from None
+
+
+def ensure_student_change_log(conn):
+    """Record the IDs of updated and deleted students so readers can refresh incrementally.
+
+    New students usually need no log entry: readers pick them up from an ID watermark.
+    Only inserts below the highest ID (an explicit ID, or one freed by a delete) are
+    logged. Only the latest sequence number is kept per student, so the log stays bounded.
+    """
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'Student_Data'").fetchone() is None:
+        # Checked first, so a missing table does not leave a half-built log behind
+        raise sqlite3.OperationalError("no such table: Student_Data")
+    conn.execute("CREATE TABLE IF NOT EXISTS Student_Changes (ID INTEGER PRIMARY KEY, Seq INTEGER NOT NULL)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_student_changes_seq ON Student_Changes (Seq)")
+    # An upsert rather than INSERT OR REPLACE: inside a trigger, SQLite swaps an OR clause
+    # for the conflict policy of the outer statement (ABORT for the form's upsert).
+    log = (
+        "INSERT INTO Student_Changes (ID, Seq) SELECT {}, (SELECT COALESCE(MAX(Seq), 0) + 1 FROM Student_Changes) "
+        "WHERE {} ON CONFLICT (ID) DO UPDATE SET Seq = excluded.Seq;"
+    )
+    # Triggers from older versions used INSERT OR REPLACE, so they are replaced
+    _ensure_triggers(conn, {
+        "student_changes_update": "CREATE TRIGGER student_changes_update AFTER UPDATE ON Student_Data BEGIN "
+        + log.format("OLD.ID", "1") + log.format("NEW.ID", "NEW.ID IS NOT OLD.ID") + " END",
+        "student_changes_delete": "CREATE TRIGGER student_changes_delete AFTER DELETE ON Student_Data BEGIN "
+        + log.format("OLD.ID", "1") + " END",
+        "student_changes_insert": "CREATE TRIGGER student_changes_insert AFTER INSERT ON Student_Data BEGIN "
+        + log.format("NEW.ID", "NEW.ID < (SELECT MAX(ID) FROM Student_Data)") + " END",
+    })
+
+
+def _ensure_triggers(conn, triggers):
+    """Create the {name: CREATE TRIGGER sql} triggers, replacing only those whose SQL differs.
+
+    Every DROP or CREATE bumps PRAGMA schema_version (clearing the course registries and
+    the pages' "schema" version), so an up-to-date database is left untouched.
+    Returns whether anything was replaced.
+    """
+    names = ", ".join(["?"] * len(triggers))
+    current = dict(conn.execute(
+        f"SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND name IN ({names})", list(triggers)
+    ).fetchall())
+    changed = False
+    for name, sql in triggers.items():
+        if current.get(name) != sql:
+            conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+            conn.execute(sql)
+            changed = True
+    return changed
+
+
+def has_student_identity(conn):
+    """Whether the unique (First Name, Last Name) index from ensure_student_identity exists."""
+    return conn.execute(
+        "SELECT 1 FROM pragma_index_list('Student_Data') WHERE name = 'idx_student_identity'"
+    ).fetchone() is not None
+
+
+def ensure_student_search(conn):
+    """Index student names and centers with FTS5 for the Student Records search box.
+
+    The index is external-content (it stores no copy of the rows) and triggers keep it
+    in sync with every Student_Data write; prefix indexes make "as you type" lookups cheap.
+    """
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'Student_Search'").fetchone()
+    conn.execute(
+        'CREATE VIRTUAL TABLE IF NOT EXISTS Student_Search USING fts5("First Name", "Last Name", Center, '
+        "content='Student_Data', content_rowid='ID', prefix='1 2 3', tokenize='unicode61 remove_diacritics 2')"
+    )
+    insert = 'INSERT INTO Student_Search (rowid, "First Name", "Last Name", Center) ' \
+             'VALUES (NEW.ID, NEW."First Name", NEW."Last Name", NEW.Center);'
+    delete = 'INSERT INTO Student_Search (Student_Search, rowid, "First Name", "Last Name", Center) ' \
+             "VALUES ('delete', OLD.ID, OLD.\"First Name\", OLD.\"Last Name\", OLD.Center);"
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS student_search_insert AFTER INSERT ON Student_Data BEGIN {insert} END")
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS student_search_delete AFTER DELETE ON Student_Data BEGIN {delete} END")
+    # Progress updates from the form do not touch the indexed columns, so they skip the index
+    conn.execute(
+        'CREATE TRIGGER IF NOT EXISTS student_search_update AFTER UPDATE OF ID, "First Name", "Last Name", Center '
+        f"ON Student_Data BEGIN {delete} {insert} END"
+    )
+    if exists is None:
+        conn.execute("INSERT INTO Student_Search (Student_Search) VALUES ('rebuild')")
+
+
+def search_expression(text):
+    """Turn free text into an FTS5 query matching every word as a prefix, or None if there are no words."""
+    words = re.findall(r"\w+", text or "")
+    return " ".join(f'"{word}"*' for word in words) or None
+
+
+def _progress_sql(value):
+    """SQL for a numeric progress value, NULL for N.A / empty entries."""
+    return f"CASE WHEN {value} IS NULL OR {value} IN ('', 'N.A') THEN NULL ELSE CAST({value} AS REAL) END"
+
+
+def _sql_string(text):
+    return "'" + text.replace("'", "''") + "'"
+
+
+def _table_columns(conn, table):
+    return [column[1] for column in conn.execute(f"PRAGMA table_info({table})").fetchall()]
+
+
+def ensure_center_rollups(conn):
+    """Create Center_Rollup and the triggers that keep it and Center_Data in step with Student_Data.
+
+    The triggers see every write, from the apps or made directly in SQL. They name each
+    course column, so when the columns change (e.g. a new category) this replaces them
+    and rebuilds the rollups; the apps call it at startup and before each write. SQLite
+    will not drop a column a trigger names: drop the student_rollup_* triggers first.
+    """
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS Center_Rollup (
+            Center TEXT NOT NULL,
+            Course TEXT NOT NULL,
+            Total REAL NOT NULL DEFAULT 0,
+            Students INTEGER NOT NULL DEFAULT 0,
+            Missing INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (Center, Course)
+        )"""
+    )
+    if _ensure_triggers(conn, _rollup_triggers(conn)):
+        rebuild_center_rollups(conn)
+
+
+def _rollup_triggers(conn):
+    courses = [column for column in _table_columns(conn, "Student_Data") if column not in IDENTITY_COLUMNS]
+    center_columns = set(_table_columns(conn, "Center_Data"))
+    averaged = [course for course in courses if course in center_columns]
+
+    def rollup(row, sign):
+        # One (course, progress) row per course column, added to (or taken from) the rollups
+        progress = " UNION ALL ".join(
+            f"SELECT {_sql_string(course)} AS Course, {_progress_sql(f'{row}.`{course}`')} AS Progress"
+            for course in courses
+        ) or "SELECT NULL AS Course, NULL AS Progress LIMIT 0"
+        return (
+            "INSERT INTO Center_Rollup (Center, Course, Total, Students, Missing) "
+            f"SELECT {row}.Center, Course, {sign} * COALESCE(Progress, 0), {sign} * (Progress IS NOT NULL), "
+            f"{sign} * (Progress IS NULL) FROM ({progress}) WHERE {row}.Center IS NOT NULL "
+            "ON CONFLICT (Center, Course) DO UPDATE SET Total = Total + excluded.Total, "
+            "Students = Students + excluded.Students, Missing = Missing + excluded.Missing; "
+        )
+
+    def refresh(centers):
+        if not averaged:
+            return ""
+        assignments = ", ".join(f"`{course}` = ({_average_sql(_sql_string(course))})" for course in averaged)
+        return f"UPDATE Center_Data SET {assignments} WHERE Center IN ({centers}); "
+
+    watched = ", ".join(f"`{column}`" for column in ("Center", *courses))
+    return {
+        "student_rollup_insert": "CREATE TRIGGER student_rollup_insert AFTER INSERT ON Student_Data BEGIN "
+        + rollup("NEW", 1) + refresh("NEW.Center") + "END",
+        "student_rollup_update": f"CREATE TRIGGER student_rollup_update AFTER UPDATE OF {watched} ON Student_Data BEGIN "
+        + rollup("OLD", -1) + rollup("NEW", 1) + refresh("OLD.Center, NEW.Center") + "END",
+        "student_rollup_delete": "CREATE TRIGGER student_rollup_delete AFTER DELETE ON Student_Data BEGIN "
+        + rollup("OLD", -1) + refresh("OLD.Center") + "END",
+    }
+
+
+def _average_sql(course):
+    # A course with only N.A entries has no average: NULL, which the dashboard's nan
+    # reductions skip, rather than a 0% that would drag them down
+    return (
+        "SELECT CASE WHEN Students > 0 THEN Total / Students END FROM Center_Rollup "
+        f"WHERE Center = Center_Data.Center AND Course = {course}"
+    )
+
+
+def rebuild_center_rollups(conn):
+    """Recompute every rollup, and the Center_Data cells they feed, from Student_Data."""
+    conn.execute("DELETE FROM Center_Rollup")
+    center_columns = set(_table_columns(conn, "Center_Data"))
+    for course in _table_columns(conn, "Student_Data"):
+        if course in IDENTITY_COLUMNS:
+            continue
+        conn.execute(
+            "INSERT INTO Center_Rollup (Center, Course, Total, Students, Missing) "
+            "SELECT Center, ?, COALESCE(SUM(Progress), 0), COUNT(Progress), COUNT(*) - COUNT(Progress) "
+            f"FROM (SELECT Center, {_progress_sql(f'`{course}`')} AS Progress FROM Student_Data "
+            "WHERE Center IS NOT NULL) GROUP BY Center",
+            (course,),
+        )
+        if course in center_columns:
+            conn.execute(
+                f"UPDATE Center_Data SET `{course}` = ({_average_sql('?')}) "
+                "WHERE Center IN (SELECT Center FROM Center_Rollup WHERE Course = ?)",
+                (course, course),
+            )
@@ -0,0 +1,90 @@
+"""Streaming CSV/XLSX exports of Student_Data and Center_Data."""
+import csv
+import io
+import os
+import sqlite3
+import tempfile
+
+from database import IDENTITY_COLUMNS, get_course_registry
+
+# URL name -> table
+EXPORT_TABLES = {"students": "Student_Data", "centers": "Center_Data"}
+CHUNK_SIZE = 1000  # Rows fetched from the cursor (and flushed to the client) at a time
+
+
+def export_columns(db_file, table, courses=None):
+    """Identity columns of table plus the requested courses (all of them by default), in table order.
+
+    Raises ValueError for courses the table does not have.
+    """
+    columns = get_course_registry(db_file).columns(table)
+    if courses:
+        unknown = set(courses) - set(columns) - set(IDENTITY_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown course(s): {', '.join(sorted(unknown))}")
+        return [column for column in columns if column in IDENTITY_COLUMNS or column in courses]
+    return columns
+
+
+def export_rows(db_file, table, columns, centers=None, chunk_size=CHUNK_SIZE):
+    """Yield the header, then the table's rows, reading the cursor chunk_size rows at a time."""
+    # A connection of its own: the export may outlive many requests on the pooled one
+    conn = sqlite3.connect(db_file, check_same_thread=False)
+    try:
+        sql = f"SELECT {', '.join(f'`{column}`' for column in columns)} FROM {table}"
+        params = []
+        if centers:
+            sql += f" WHERE Center IN ({', '.join(['?'] * len(centers))})"
+            params = list(centers)
+        if "ID" in columns:
+            sql += " ORDER BY ID"
+        cursor = conn.execute(sql, params)
+        yield columns
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        conn.close()
+
+
+def stream_csv(rows, chunk_size=CHUNK_SIZE):
+    """Encode rows as CSV, yielding a chunk every chunk_size rows so the download starts at once."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for count, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if count % chunk_size == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+def stream_xlsx(rows, title, chunk_size=64 * 1024):
+    """Write rows with openpyxl's write-only mode, then stream the finished workbook.
+
+    Write-only worksheets keep rows in a temporary file rather than in memory, but an
+    XLSX is a ZIP whose parts are only final once the workbook is saved, so bytes start
+    flowing after the last row is written.
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title)
+    for row in rows:
+        sheet.append(row)
+
+    fd, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    try:
+        workbook.save(path)
+        with open(path, "rb") as f:
+            while True:
+                data = f.read(chunk_size)
+                if not data:
+                    break
+                yield data
+    finally:
+        os.remove(path)
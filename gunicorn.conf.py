@@ -0,0 +1,20 @@
+# gunicorn -c gunicorn.conf.py wsgi:application
+import multiprocessing
+import os
+
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+chdir = os.path.dirname(os.path.abspath(__file__))  # The apps open graph_data.db relative to here
+
+# Worker processes scale with cores; each worker also serves a few requests concurrently.
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+worker_class = "gthread"
+threads = int(os.environ.get("THREADS", 4))
+
+# Loading the apps once in the master keeps memory shared between workers. Database
+# connections are opened lazily and re-opened after fork, so nothing is shared across workers.
+preload_app = True
+
+timeout = 60
+graceful_timeout = 30
+max_requests = 1000
+max_requests_jitter = 100
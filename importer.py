@@ -0,0 +1,257 @@
+"""Bulk import of student records from CSV or XLSX files.
+
+Example:
+    python importer.py students.xlsx --db graph_data.db
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sqlite3
+import sys
+import time
+
+from database import IDENTITY_COLUMNS, ensure_center_rollups, get_course_registry
+
+CHUNK_SIZE = 500  # Rows per transaction (and per executemany)
+MAX_ERRORS = 1000  # Per-row errors kept in a report; the rest are only counted
+REQUIRED_COLUMNS = ("First Name", "Last Name", "Center")
+
+
+def validate_progress(value):
+    """Normalize a progress cell to the form's domain: an integer 0-100, "N.A", or None when blank."""
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return None
+    text = str(value).strip().rstrip("%").strip()
+    if text.upper() in ("N.A", "NA", "N/A"):
+        return "N.A"
+    try:
+        number = float(text)
+    except ValueError:
+        raise ValueError(f"{value!r} is not a percentage or N.A") from None
+    if not number.is_integer() or not 0 <= number <= 100:
+        raise ValueError(f"{value!r} is not a whole number from 0 to 100")
+    return int(number)
+
+
+class ImportFileError(Exception):
+    """The uploaded file could not be read as CSV/XLSX (as opposed to a database failure)."""
+
+
+def read_rows(file, fmt):
+    """Yield the header, then each row of a binary CSV or XLSX file object, without loading it whole.
+
+    Any failure to parse the file is raised as ImportFileError.
+    """
+    try:
+        yield from _read_rows(file, fmt)
+    except Exception as e:
+        raise ImportFileError(f"Could not read the file: {e}") from e
+
+
+def _read_rows(file, fmt):
+    if fmt == "csv":
+        yield from csv.reader(io.TextIOWrapper(file, encoding="utf-8-sig", newline=""))
+    elif fmt == "xlsx":
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(file, read_only=True, data_only=True)
+        try:
+            for row in workbook.worksheets[0].iter_rows(values_only=True):
+                yield ["" if value is None else value for value in row]
+        finally:
+            workbook.close()
+    else:
+        raise ValueError(f"Unsupported format: {fmt}")
+
+
+class ImportReport:
+    """Counts, per-row errors and throughput of one import."""
+
+    def __init__(self):
+        self.rows = 0
+        self.inserted = 0
+        self.updated = 0
+        self.errors = []  # (row number in the file, message)
+        self.error_count = 0
+        self.seconds = 0.0
+
+    def error(self, row, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append((row, message))
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def as_dict(self):
+        return {
+            "rows": self.rows,
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "error_count": self.error_count,
+            "errors": [{"row": row, "error": message} for row, message in self.errors],
+            "seconds": round(self.seconds, 3),
+            "rows_per_second": round(self.rows_per_second, 1),
+        }
+
+
+def import_students(rows, db_file="graph_data.db", chunk_size=CHUNK_SIZE, dry_run=False, write_queue=None):
+    """Validate and upsert rows (header first) into Student_Data, one transaction per chunk.
+
+    Students are matched on first and last name, as in the entry form; blank cells leave
+    an existing student's value unchanged. Rollups are updated in the same transactions,
+    by the Student_Data triggers.
+    Inside an app, pass its WriteQueue so chunks are written by the app's writer thread.
+    """
+    report = ImportReport()
+    started = time.perf_counter()
+    rows = iter(rows)
+    header = [str(column).strip() for column in next(rows, [])]
+
+    courses = get_course_registry(db_file).course_columns("Student_Data")
+    missing = [column for column in REQUIRED_COLUMNS if column not in header]
+    unknown = [column for column in header if column and column not in courses and column not in IDENTITY_COLUMNS]
+    if missing or unknown:
+        problems = [f"missing column {column!r}" for column in missing]
+        problems += [f"unknown course {column!r}" for column in unknown]
+        report.error(1, "; ".join(problems))
+        return report
+    file_courses = [column for column in header if column in courses]
+
+    conn = sqlite3.connect(db_file)
+    try:
+        centers = {row[0] for row in conn.execute("SELECT DISTINCT Center FROM Center_Data")}
+
+        def write(students):
+            if write_queue is not None and not dry_run:
+                statuses = write_queue.run(upsert_students, students, file_courses, dry_run)
+            else:
+                with conn:  # One transaction per chunk
+                    statuses = upsert_students(conn, students, file_courses, dry_run)
+            report.inserted += statuses.count("inserted")
+            report.updated += statuses.count("updated")
+
+        chunk = {}
+        for number, row in enumerate(rows, 2):
+            if not any(str(value).strip() for value in row):
+                continue  # Blank line
+            report.rows += 1
+            try:
+                student = validate_student(dict(zip(header, row)), file_courses, centers)
+            except ValueError as e:
+                report.error(number, str(e))
+                continue
+            key = (student["First Name"], student["Last Name"])
+            if key in chunk:  # Repeated in the file: later non-blank cells win
+                student = dict(chunk[key], **{k: v for k, v in student.items() if v is not None})
+            chunk[key] = student
+            if len(chunk) >= chunk_size:
+                write(list(chunk.values()))
+                chunk = {}
+        if chunk:
+            write(list(chunk.values()))
+    finally:
+        conn.close()
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def validate_student(row, courses, centers):
+    """Apply the entry form's rules to one row dict; returns the cleaned student or raises ValueError."""
+    student = {}
+    for column in ("First Name", "Last Name"):
+        value = str(row.get(column, "")).strip()
+        if not value:
+            raise ValueError(f"{column} is required")
+        student[column] = value
+    center = str(row.get("Center", "")).strip()
+    if center not in centers:
+        raise ValueError(f"Unknown center {center!r}" if center else "Center is required")
+    student["Center"] = center
+
+    for course in courses:
+        try:
+            student[course] = validate_progress(row.get(course))
+        except ValueError as e:
+            raise ValueError(f"{course}: {e}") from None
+    return student
+
+
+def upsert_students(conn, students, courses, dry_run):
+    """Upsert validated students (unique names) in the caller's transaction.
+
+    courses are the columns being written. Returns "inserted" or "updated" per student,
+    in order.
+    """
+    names = [value for student in students for value in (student["First Name"], student["Last Name"])]
+    # Joining from the names lets SQLite probe the unique name index once per student
+    cursor = conn.execute(
+        f"SELECT `First Name`, `Last Name`, ID FROM (VALUES {', '.join(['(?, ?)'] * len(students))}) AS names "
+        "JOIN Student_Data ON `First Name` = names.column1 AND `Last Name` = names.column2",
+        names,
+    )
+    existing = {(first, last): student_id for first, last, student_id in cursor.fetchall()}
+
+    updates = []
+    inserts = []
+    statuses = []
+    for student in students:
+        student_id = existing.get((student["First Name"], student["Last Name"]))
+        statuses.append("inserted" if student_id is None else "updated")
+        if student_id is None:
+            # Courses missing from the file are stored as NULL, which the rollups count as missing
+            inserts.append([student["First Name"], student["Last Name"], student["Center"]]
+                           + [student[course] for course in courses])
+        else:
+            updates.append([student["Center"]] + [student[course] for course in courses] + [student_id])
+
+    if dry_run:  # A dry run writes nothing, not even the rollup triggers
+        return statuses
+
+    ensure_center_rollups(conn)
+    if inserts:
+        column_names = ", ".join(f"`{column}`" for column in ("First Name", "Last Name", "Center", *courses))
+        conn.executemany(
+            f"INSERT INTO Student_Data ({column_names}) VALUES ({', '.join(['?'] * (3 + len(courses)))})",
+            inserts,
+        )
+    if updates:
+        assignments = ", ".join(f"`{column}` = COALESCE(?, `{column}`)" for column in ("Center", *courses))
+        conn.executemany(f"UPDATE Student_Data SET {assignments} WHERE ID = ?", updates)
+    return statuses
+
+
+def file_format(filename):
+    extension = os.path.splitext(filename or "")[1].lower().lstrip(".")
+    return extension if extension in ("csv", "xlsx") else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("file", help="CSV or XLSX file with First Name, Last Name, Center and course columns")
+    parser.add_argument("--db", default="graph_data.db")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="validate and count, but write nothing")
+    args = parser.parse_args(argv)
+
+    fmt = file_format(args.file)
+    if fmt is None:
+        parser.error("file must be .csv or .xlsx")
+    with open(args.file, "rb") as f:
+        try:
+            report = import_students(read_rows(f, fmt), args.db, args.chunk_size, args.dry_run)
+        except ImportFileError as e:
+            print(f"row 0: {e}", file=sys.stderr)
+            return 1
+
+    for row, message in report.errors:
+        print(f"row {row}: {message}", file=sys.stderr)
+    print(json.dumps({key: value for key, value in report.as_dict().items() if key != "errors"}))
+    return 1 if report.error_count else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,585 @@
+"""Report-card rendering, kept in an importable module so it can run in worker processes."""
+import contextlib
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from io import BytesIO
+
+try:
+    import fcntl
+except ImportError:  # Windows: renders are then bounded per process only
+    fcntl = None
+
+# Bump whenever the report layout or chart styling changes, so cached files are not reused
+TEMPLATE_VERSION = 3
+
+# "vector" draws the chart with reportlab.graphics; "plotly" rasterizes the Plotly figure (needs Kaleido)
+CHART_BACKEND = os.environ.get("REPORT_CHART_BACKEND", "vector")
+
+
+class ReportStudent(namedtuple("ReportStudent", ["first_name", "last_name", "center", "courses", "progress"])):
+    """Everything a worker process needs to render one report card; plain data, so it pickles."""
+    __slots__ = ()
+
+    @property
+    def name(self):
+        return f"{self.first_name} {self.last_name}"
+
+
+def build_chart(student):
+    """The course-progress bar chart embedded in report cards."""
+    import plotly.graph_objects as go
+
+    fig = go.Figure()
+    fig.add_trace(go.Bar(x=list(student.courses), y=list(student.progress), name=student.name))
+    return fig
+
+
+def build_vector_chart(student):
+    """The course-progress bar chart as reportlab vector shapes; no browser or rasterizing needed."""
+    from reportlab.graphics.charts.barcharts import VerticalBarChart
+    from reportlab.graphics.shapes import Drawing
+    from reportlab.lib import colors
+
+    values = []
+    for progress in student.progress:
+        try:
+            values.append(float(progress))
+        except (TypeError, ValueError):  # N.A: no bar, rather than a 0% the student never scored
+            values.append(None)
+
+    drawing = Drawing(400, 250)
+    chart = VerticalBarChart()
+    chart.x, chart.y, chart.width, chart.height = 40, 40, 340, 190
+    chart.data = [values]
+    chart.categoryAxis.categoryNames = [str(course) for course in student.courses]
+    chart.categoryAxis.labels.angle = 30 if len(values) > 6 else 0
+    chart.categoryAxis.labels.boxAnchor = "ne" if len(values) > 6 else "n"
+    chart.valueAxis.valueMin = 0
+    chart.valueAxis.valueMax = 100
+    chart.valueAxis.valueStep = 20
+    chart.bars[0].fillColor = colors.HexColor("#636efa")  # Plotly's default trace color
+    chart.bars[0].strokeColor = None
+    drawing.add(chart)
+    return drawing
+
+
+def build_report_chart(student, include_chart):
+    if not include_chart:
+        return None
+    return build_vector_chart(student) if CHART_BACKEND == "vector" else build_chart(student)
+
+
+def generate_pdf(student, graph_figure, cache=None):
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib import colors
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.graphics.shapes import Drawing
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
+
+    courses = student.courses
+    pdf_buffer = BytesIO()
+    doc = SimpleDocTemplate(pdf_buffer, pagesize=letter)
+
+    # Define styles
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle(
+        'Title',
+        parent=styles['Title'],
+        fontName='Helvetica-Bold',
+        fontSize=20,
+        spaceAfter=12,
+        textColor=colors.cornflowerblue,
+    )
+    heading_style = ParagraphStyle(
+        'Heading1',
+        parent=styles['Heading1'],
+        fontName='Helvetica-Bold',
+        fontSize=14,
+        spaceAfter=6,
+        textColor=colors.cornflowerblue,
+    )
+    body_style = ParagraphStyle(
+        'BodyText',
+        parent=styles['BodyText'],
+        fontName='Helvetica',
+        fontSize=12,
+        spaceAfter=6,
+        textColor=colors.black,
+    )
+    # Build content
+    title = Paragraph(f"Student Report for {student.name}", title_style)
+    center_info = Paragraph(f"Center: {student.center}", body_style)
+    progress_heading = Paragraph("Course Progress:", heading_style)
+
+    # Build table data
+    table_data = [['Course', 'Progress']]
+    table_data.extend([(course, f"{progress}%") for course, progress in zip(courses, student.progress)])
+
+    # Define table style with larger padding and font size
+    table_style = TableStyle(
+        [
+            ('BACKGROUND', (0, 0), (-1, 0), colors.steelblue),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 16),  # Larger padding
+            ('BACKGROUND', (0, 1), (-1, -1), colors.whitesmoke),
+            ('PADDING', (0, 0), (-1, -1), 10),  # Larger padding
+            ('FONTSIZE', (0, 0), (-1, 0), 14),  # Larger font size
+            ('FONTSIZE', (0, 1), (-1, -1), 12),  # Larger font size
+        ]
+    )
+
+    # Build main table
+    main_table = Table(table_data, style=table_style)
+
+    # Add graph to PDF content
+    if isinstance(graph_figure, Drawing):
+        # Vector chart, embedded as-is
+        content = [title, Spacer(1, 12), center_info, Spacer(1, 12), progress_heading, Spacer(1, 12)]
+        content.append(main_table)
+        content.append(graph_figure)
+
+    elif graph_figure:
+        import plotly.io as pio
+
+        # Create a static image of the graph (rasterizing is the slow part, so reuse cached images)
+        image_key = cache.key("chart", student) if cache else None
+        static_image_bytes = cache.read(image_key, ".png") if cache else None
+        if static_image_bytes is None:
+            static_image_bytes = pio.to_image(graph_figure, format='png', width=800, height=500, scale=2)
+            if cache:
+                cache.write(image_key, ".png", static_image_bytes)
+
+        # Add the image to the PDF
+        graph_image = Image(BytesIO(static_image_bytes), width=400, height=250)  # Adjust width and height as needed
+
+        # Build the PDF document with the main table and graph image side by side
+        content = [title, Spacer(1, 12), center_info, Spacer(1, 12), progress_heading, Spacer(1, 12)]
+
+        # Add main table and graph image side by side
+        content.append(main_table)
+        content.append(graph_image)
+
+    else:
+        # Build the PDF document with only the main table
+        content = [title, Spacer(1, 12), center_info, Spacer(1, 12), progress_heading, Spacer(1, 12), main_table]
+
+    doc.build(content)
+    pdf_buffer.seek(0)
+    return pdf_buffer
+
+
+class RenderSlots:
+    """Caps the renders running at once across every process that shares lock_dir.
+
+    Each WSGI worker owns a pool, so a per-pool limit would multiply with the worker
+    count; instead a render first takes an fcntl lock on one of count slot files.
+    """
+
+    def __init__(self, lock_dir, count, poll=0.05):
+        self.lock_dir = lock_dir
+        self.count = count
+        self.poll = poll  # Seconds between attempts while every slot is taken
+
+    @contextlib.contextmanager
+    def hold(self):
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(self.lock_dir, exist_ok=True)
+        while True:
+            for slot in range(self.count):
+                f = open(os.path.join(self.lock_dir, f"slot-{slot}.lock"), "a")
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    f.close()
+                    continue
+                try:
+                    yield
+                finally:
+                    f.close()  # Releases the lock
+                return
+            time.sleep(self.poll)
+
+
+def render_report(student, include_chart, path, cache=None, slots=None):
+    """Process-pool entry point: render one report card to path."""
+    with slots.hold() if slots else contextlib.nullcontext():
+        pdf_buffer = generate_pdf(student, build_report_chart(student, include_chart), cache)
+    _write_atomic(path, pdf_buffer.getvalue())
+    return path
+
+
+def render_report_bytes(student, include_chart, path=None, cache=None, slots=None):
+    """Process-pool entry point for bulk export: render one report card and return the PDF bytes."""
+    with slots.hold() if slots else contextlib.nullcontext():
+        data = generate_pdf(student, build_report_chart(student, include_chart), cache).getvalue()
+    if path:
+        _write_atomic(path, data)
+    return data
+
+
+class _StreamBuffer:
+    """Write-only sink that lets zipfile produce an archive piece by piece."""
+
+    def __init__(self):
+        self._chunks = []
+        self._offset = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._offset
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _write_atomic(path, data):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _link_or_copy(source, destination):
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copyfile(source, destination)
+
+
+class ReportCache:
+    """Content-addressed on-disk cache of rendered report PDFs and chart images.
+
+    Keys hash the student's row, the course header and TEMPLATE_VERSION, so an entry is
+    reused exactly until something it depends on changes. Least recently used files are
+    evicted once the cache grows past max_bytes.
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=None):
+        self.cache_dir = cache_dir or os.environ.get(
+            "REPORT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "student-report-cache")
+        )
+        self.max_bytes = max_bytes or int(os.environ.get("REPORT_CACHE_MAX_MB", 512)) * 1024 * 1024
+        self._lock = threading.Lock()
+        self._size = None
+        self.hits = 0
+        self.misses = 0
+
+    def __getstate__(self):
+        # Shipped to worker processes, which keep their own lock and size estimate
+        return {"cache_dir": self.cache_dir, "max_bytes": self.max_bytes}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def key(self, kind, student, include_chart=False):
+        payload = json.dumps(
+            [TEMPLATE_VERSION, CHART_BACKEND, kind, include_chart, student.first_name, student.last_name, student.center,
+             list(student.courses), list(student.progress)],
+            default=str,
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def path(self, key, suffix):
+        return os.path.join(self.cache_dir, key[:2], key + suffix)
+
+    def lookup(self, key, suffix):
+        """Return the cached file's path, or None; a hit marks the entry as recently used."""
+        path = self.path(key, suffix)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return path
+
+    def read(self, key, suffix):
+        path = self.lookup(key, suffix)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:  # Evicted by another process in between
+            return None
+
+    def write(self, key, suffix, data):
+        path = self.reserve(key, suffix)
+        _write_atomic(path, data)
+        self.added(len(data))
+        return path
+
+    def reserve(self, key, suffix):
+        """Return the path a new entry should be written to, creating its directory."""
+        path = self.path(key, suffix)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def added(self, size):
+        """Account for a newly written entry and evict if the cache is over budget."""
+        with self._lock:
+            if self._size is None:
+                self._size = sum(entry[2] for entry in self._entries())
+            else:
+                self._size += size
+            if self._size > self.max_bytes:
+                self._size = self._evict()
+
+    def _entries(self):
+        entries = []
+        for root, _dirs, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, path, stat.st_size))
+        return entries
+
+    def _evict(self):
+        """Remove least recently used entries until the cache is below 90% of max_bytes."""
+        entries = sorted(self._entries())
+        size = sum(entry[2] for entry in entries)
+        for _mtime, path, file_size in entries:
+            if size <= self.max_bytes * 0.9:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            size -= file_size
+        return size
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / total if total else 0.0,
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+            }
+
+
+def _process_context():
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+class ReportQueue:
+    """Renders report cards in a bounded process pool.
+
+    Job status and results live on disk, so any WSGI worker process can answer a poll
+    for a job submitted through another one. max_workers (REPORT_WORKERS) bounds the
+    renders running at once across all WSGI workers sharing job_dir, not per worker.
+    """
+
+    JOB_ID = re.compile(r"[0-9a-f]{32}")
+
+    def __init__(self, job_dir=None, max_workers=None, max_pending=None, keep_seconds=3600, cache=None):
+        self.job_dir = job_dir or os.environ.get(
+            "REPORT_JOB_DIR", os.path.join(tempfile.gettempdir(), "student-report-jobs")
+        )
+        self.max_workers = max_workers or int(os.environ.get("REPORT_WORKERS", 2))
+        self.max_pending = max_pending or int(os.environ.get("REPORT_QUEUE_LIMIT", 100))
+        self.keep_seconds = keep_seconds
+        self.cache = cache if cache is not None else ReportCache()
+        self.slots = RenderSlots(os.path.join(self.job_dir, "slots"), self.max_workers)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self.pending = 0
+
+    def _pool(self):
+        # Created lazily, and again after a fork, so WSGI workers each own their pool
+        if self._executor is None or self._pid != os.getpid():
+            os.makedirs(self.job_dir, exist_ok=True)
+            # Not fork: WSGI workers run other threads, and a child forked while one of them
+            # holds a lock (e.g. the import lock) would wait on it forever
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=_process_context())
+            self._pid = os.getpid()
+            self.pending = 0
+        return self._executor
+
+    def _path(self, job_id, suffix):
+        if not self.JOB_ID.fullmatch(job_id or ""):
+            raise KeyError(job_id)
+        return os.path.join(self.job_dir, job_id + suffix)
+
+    def _set_status(self, job_id, **status):
+        _write_atomic(self._path(job_id, ".json"), json.dumps(dict(status, updated=time.time())).encode())
+
+    def submit(self, student, include_chart=False):
+        """Queue a report; returns the job id, or None when the queue is full."""
+        job_id, _future = self._submit(student, include_chart)
+        return job_id
+
+    def _submit(self, student, include_chart):
+        key = self.cache.key("pdf", student, include_chart)
+        cached = self.cache.lookup(key, ".pdf")
+        if cached is not None:
+            # Repeat downloads are served from disk without touching the pool
+            job_id = uuid.uuid4().hex
+            self._prune()
+            os.makedirs(self.job_dir, exist_ok=True)
+            _link_or_copy(cached, self._path(job_id, ".pdf"))
+            self._set_status(job_id, status="done", student=student.name, cached=True)
+            future = Future()
+            future.set_result(self._path(job_id, ".pdf"))
+            return job_id, future
+
+        with self._lock:
+            executor = self._pool()
+            if self.pending >= self.max_pending:
+                return None, None
+            self.pending += 1
+        self._prune()
+
+        job_id = uuid.uuid4().hex
+        self._set_status(job_id, status="queued", student=student.name)
+        future = executor.submit(
+            render_report, student, include_chart, self.cache.reserve(key, ".pdf"), self.cache, self.slots
+        )
+        future.add_done_callback(lambda done: self._finish(job_id, student, done))
+        return job_id, future
+
+    def _finish(self, job_id, student, future):
+        with self._lock:
+            self.pending -= 1
+        error = future.exception()
+        if error is None:
+            _link_or_copy(future.result(), self._path(job_id, ".pdf"))
+            self.cache.added(os.path.getsize(future.result()))
+            self._set_status(job_id, status="done", student=student.name)
+        else:
+            self._set_status(job_id, status="failed", student=student.name, error=str(error))
+
+    def render(self, student, include_chart=False, timeout=120):
+        """Render in the pool and wait; keeps CPU-heavy work out of the request thread's process."""
+        job_id, future = self._submit(student, include_chart)
+        if job_id is None:
+            raise RuntimeError("Report queue is full")
+        # The rendered file itself: the job's copy is only linked by the done-callback,
+        # which concurrent.futures runs after waking this waiter
+        return future.result(timeout)
+
+    def warm(self, students, include_chart=False, window=None):
+        """Render every uncached report card for students, e.g. after a bulk data change.
+
+        Returns the number of reports rendered.
+        """
+        items = ((None, student) for student in students)
+        return sum(1 for _filename, _data, cached in self._render_many(items, include_chart, window) if not cached)
+
+    def stream_zip(self, items, include_chart=False, window=None):
+        """Render (filename, ReportStudent) items in the pool and yield a ZIP archive as it grows.
+
+        At most ``window`` reports are in flight or buffered at once, so memory stays
+        bounded however many students are exported, and bytes flow from the first report on.
+        """
+        buffer = _StreamBuffer()
+        # PDFs are already compressed, so entries are stored rather than deflated
+        with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_STORED) as archive:
+            for filename, data, _cached in self._render_many(items, include_chart, window):
+                if isinstance(data, Exception):
+                    archive.writestr(filename + ".error.txt", f"Error generating PDF: {data}\n")
+                else:
+                    archive.writestr(filename, data)
+                yield buffer.drain()
+        yield buffer.drain()  # Central directory
+
+    def _render_many(self, items, include_chart, window):
+        """Yield (filename, PDF bytes or exception, cached) per item, in completion order."""
+        executor = self._pool()
+        window = window or self.max_workers * 2
+        items = iter(items)
+        pending = {}
+
+        def fill():
+            # Submits uncached items until the window is full; cache hits are yielded directly
+            while len(pending) < window:
+                item = next(items, None)
+                if item is None:
+                    return
+                filename, student = item
+                key = self.cache.key("pdf", student, include_chart)
+                data = self.cache.read(key, ".pdf")
+                if data is not None:
+                    yield filename, data, True
+                    continue
+                path = self.cache.reserve(key, ".pdf")
+                future = executor.submit(render_report_bytes, student, include_chart, path, self.cache, self.slots)
+                pending[future] = filename
+
+        try:
+            while True:
+                yield from fill()
+                if not pending:
+                    return
+                done, _not_done = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    filename = pending.pop(future)
+                    error = future.exception()
+                    if error is None:
+                        self.cache.added(len(future.result()))
+                    yield filename, error or future.result(), False
+        finally:
+            # The client may disconnect mid-download; do not keep rendering for nobody
+            for future in pending:
+                future.cancel()
+
+    def status(self, job_id):
+        """Return the job's status dict; raises KeyError for unknown jobs."""
+        try:
+            with open(self._path(job_id, ".json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise KeyError(job_id) from None
+
+    def result_path(self, job_id):
+        return self._path(job_id, ".pdf")
+
+    def _prune(self):
+        """Drop jobs older than keep_seconds."""
+        cutoff = time.time() - self.keep_seconds
+        try:
+            names = os.listdir(self.job_dir)
+        except FileNotFoundError:
+            return
+        for name in names:
+            path = os.path.join(self.job_dir, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,25 @@
+import sqlite3
+
+import changefeed
+from changefeed import ChangeFeed
+from database import ConnectionPool
+
+
+def test_the_store_starts_at_the_current_version(tmp_path):
+    path = str(tmp_path / "graph_data.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE Center_Data (Center TEXT)")
+    conn.execute("CREATE TABLE Student_Data (Center TEXT, ID INTEGER PRIMARY KEY)")
+    conn.commit()
+    feed = ChangeFeed(ConnectionPool(path))
+
+    _interval, store = changefeed.components(feed, ["schema", "centers"])
+    versions = feed.versions()
+    assert store.data == f"{versions['schema']}:{versions['centers']}"
+
+
+def test_the_store_starts_empty_without_the_tables(tmp_path):
+    feed = ChangeFeed(ConnectionPool(str(tmp_path / "graph_data.db")))
+
+    _interval, store = changefeed.components(feed, ["schema"])
+    assert store.data is None
@@ -0,0 +1,47 @@
+import sqlite3
+
+import pytest
+
+from Dashboard import CenterDataSnapshot, PieLineCharts
+from database import ConnectionPool, ensure_center_rollups
+
+
+@pytest.fixture
+def db_file(tmp_path):
+    path = str(tmp_path / "graph_data.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE Center_Data (Center TEXT, `Course A` REAL, `Course B` REAL)")
+    conn.executemany("INSERT INTO Center_Data (Center) VALUES (?)", [("North",), ("South",)])
+    conn.execute(
+        "CREATE TABLE Student_Data (`First Name` TEXT, `Last Name` TEXT, Center TEXT, "
+        "`Course A` TEXT, `Course B` TEXT, ID INTEGER PRIMARY KEY)"
+    )
+    conn.executemany(
+        "INSERT INTO Student_Data VALUES (?, ?, ?, ?, ?, ?)",
+        [("Ada", "Lovelace", "North", "40", "N.A", 1), ("Alan", "Turing", "North", "N.A", "N.A", 2),
+         ("Grace", "Hopper", "South", "80", "60", 3)],
+    )
+    ensure_center_rollups(conn)
+    conn.commit()
+    conn.close()
+    return path
+
+
+def test_missing_counts_are_aligned_with_the_values(db_file):
+    pool = ConnectionPool(db_file)
+    center_names, courses, values, missing = CenterDataSnapshot(pool).matrix()
+
+    assert center_names.tolist() == ["North", "South"]
+    assert courses == ["Course A", "Course B"]
+    assert missing.tolist() == [[1, 2], [0, 0]]
+    assert values[0, 0] == 40 and values[1].tolist() == [80, 60]
+
+
+def test_na_count_and_mean_reductions(db_file):
+    pool = ConnectionPool(db_file)
+    charts = PieLineCharts(db_file, pool=pool)
+
+    charts.reduction = "na_count"
+    assert charts.chart_data(["North"], None)[1] == {"North": 3}
+    charts.reduction = "mean"
+    assert charts.chart_data(None, None)[1] == {"North": 40, "South": 70}
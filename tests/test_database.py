@@ -0,0 +1,44 @@
+import os
+import sqlite3
+
+import pytest
+
+from database import WriteQueue, ensure_student_change_log
+
+
+def create_table(conn):
+    conn.execute("CREATE TABLE IF NOT EXISTS t (x)")
+    return "ok"
+
+
+def test_write_queue_recovers_when_the_writer_cannot_open(tmp_path):
+    queue = WriteQueue(str(tmp_path / "missing" / "graph_data.db"))
+    with pytest.raises(Exception, match="unable to open"):
+        queue.run(create_table, timeout=5)
+
+    os.makedirs(tmp_path / "missing")
+    assert queue.run(create_table, timeout=5) == "ok"
+
+
+def test_student_change_log_leaves_an_up_to_date_schema_alone():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE Student_Data (`First Name` TEXT, `Last Name` TEXT, Center TEXT, ID INTEGER PRIMARY KEY)")
+    ensure_student_change_log(conn)
+    version = conn.execute("PRAGMA schema_version").fetchone()[0]
+
+    ensure_student_change_log(conn)
+    assert conn.execute("PRAGMA schema_version").fetchone()[0] == version
+
+
+def test_student_change_log_replaces_old_triggers():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE Student_Data (`First Name` TEXT, `Last Name` TEXT, Center TEXT, ID INTEGER PRIMARY KEY)")
+    conn.execute("CREATE TABLE Student_Changes (ID INTEGER PRIMARY KEY, Seq INTEGER NOT NULL)")
+    conn.execute(
+        "CREATE TRIGGER student_changes_delete AFTER DELETE ON Student_Data BEGIN "
+        "INSERT OR REPLACE INTO Student_Changes (ID, Seq) VALUES (OLD.ID, 1); END"
+    )
+    ensure_student_change_log(conn)
+
+    sql = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'student_changes_delete'").fetchone()[0]
+    assert "OR REPLACE" not in sql
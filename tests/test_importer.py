@@ -0,0 +1,76 @@
+import sqlite3
+
+import pytest
+
+import importer
+from database import ensure_center_rollups, ensure_student_identity
+from importer import import_students, validate_progress
+
+
+@pytest.fixture
+def db_file(tmp_path):
+    path = str(tmp_path / "graph_data.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE Center_Data (Center TEXT, `Course A` REAL, `Course B` REAL)")
+    conn.execute("INSERT INTO Center_Data (Center) VALUES ('North')")
+    conn.execute(
+        "CREATE TABLE Student_Data (`First Name` TEXT, `Last Name` TEXT, Center TEXT, "
+        "`Course A` TEXT, `Course B` TEXT, ID INTEGER PRIMARY KEY)"
+    )
+    conn.execute("INSERT INTO Student_Data VALUES ('Ada', 'Lovelace', 'North', '10', '20', 1)")
+    ensure_student_identity(conn)
+    ensure_center_rollups(conn)
+    conn.commit()
+    conn.close()
+    return path
+
+
+@pytest.mark.parametrize("value, expected", [
+    (None, None), ("  ", None), (0, 0), ("100", 100), (" 45% ", 45), ("7.0", 7),
+    ("na", "N.A"), ("N/A", "N.A"), ("N.A", "N.A"),
+])
+def test_valid_progress(value, expected):
+    assert validate_progress(value) == expected
+
+
+@pytest.mark.parametrize("value", ["101", "-1", "12.5", "lots"])
+def test_invalid_progress(value):
+    with pytest.raises(ValueError):
+        validate_progress(value)
+
+
+def test_repeated_students_are_merged_within_a_chunk(db_file):
+    rows = [
+        ["First Name", "Last Name", "Center", "Course A", "Course B"],
+        ["Ada", "Lovelace", "North", "50", ""],
+        ["Alan", "Turing", "North", "", "30"],
+        ["Ada", "Lovelace", "North", "", "60"],
+        ["Alan", "Turing", "North", "N.A", ""],
+        ["Grace", "Hopper", "Nowhere", "10", "10"],
+        ["", "", "", "", ""],
+    ]
+    report = import_students(rows, db_file)
+
+    assert (report.rows, report.inserted, report.updated) == (5, 1, 1)
+    assert report.errors == [(6, "Unknown center 'Nowhere'")]
+    conn = sqlite3.connect(db_file)
+    assert conn.execute("SELECT `First Name`, `Course A`, `Course B` FROM Student_Data ORDER BY ID").fetchall() == [
+        ("Ada", "50", "60"), ("Alan", "N.A", "30"),
+    ]
+    assert conn.execute("SELECT `Course A`, `Course B` FROM Center_Data").fetchone() == (50.0, 45.0)
+
+
+def test_a_dry_run_writes_nothing(db_file):
+    rows = [["First Name", "Last Name", "Center", "Course A"], ["Alan", "Turing", "North", "30"]]
+    report = import_students(rows, db_file, dry_run=True)
+
+    assert report.inserted == 1
+    assert sqlite3.connect(db_file).execute("SELECT COUNT(*) FROM Student_Data").fetchone() == (1,)
+
+
+def test_the_cli_reports_an_unreadable_file_without_a_traceback(tmp_path, capsys):
+    path = tmp_path / "bad.csv"
+    path.write_bytes(b"First Name,Last Name,Center\n\xff\xfe,x,y\n")
+
+    assert importer.main([str(path), "--db", str(tmp_path / "graph_data.db")]) == 1
+    assert capsys.readouterr().err.startswith("row 0: Could not read the file:")
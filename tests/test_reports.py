@@ -0,0 +1,62 @@
+import os
+import threading
+
+import pytest
+
+import reports
+from reports import RenderSlots
+
+
+@pytest.mark.skipif(reports.fcntl is None, reason="render slots need fcntl")
+def test_render_slots_are_shared_by_every_holder(tmp_path):
+    slots = RenderSlots(str(tmp_path), 1, poll=0.01)
+    entered = threading.Event()
+
+    def render():
+        with slots.hold():
+            entered.set()
+
+    thread = threading.Thread(target=render)
+    with slots.hold():
+        thread.start()
+        assert not entered.wait(0.2)
+    assert entered.wait(5)
+    thread.join()
+
+
+def test_na_progress_draws_no_bar():
+    student = reports.ReportStudent("Ada", "Lovelace", "North", ["Course A", "Course B"], ["40", "N.A"])
+    chart = reports.build_vector_chart(student).contents[0]
+
+    assert chart.data == [[40.0, None]]
+
+
+def test_the_report_cache_serves_hits_and_evicts_the_least_recently_used(tmp_path):
+    cache = reports.ReportCache(str(tmp_path), max_bytes=250)
+    students = [reports.ReportStudent("Ada", "Lovelace", "North", ["Course A"], [progress]) for progress in (1, 2, 3)]
+    keys = [cache.key("pdf", student) for student in students]
+    assert len(set(keys)) == 3
+    assert cache.key("pdf", students[0]) == keys[0]
+
+    assert cache.read(keys[0], ".pdf") is None
+    for age, key in enumerate(keys[:2]):
+        path = cache.write(key, ".pdf", b"x" * 100)
+        os.utime(path, (age, age))
+    assert cache.read(keys[0], ".pdf") == b"x" * 100  # A hit makes it the most recently used
+    cache.write(keys[2], ".pdf", b"x" * 100)
+
+    assert cache.lookup(keys[1], ".pdf") is None
+    assert cache.lookup(keys[0], ".pdf") and cache.lookup(keys[2], ".pdf")
+    assert (cache.hits, cache.misses) == (3, 2)
+
+
+def test_a_repeat_download_is_served_from_the_cache(tmp_path):
+    cache = reports.ReportCache(str(tmp_path / "cache"))
+    queue = reports.ReportQueue(str(tmp_path / "jobs"), max_workers=1, cache=cache)
+    student = reports.ReportStudent("Ada", "Lovelace", "North", ["Course A"], [40])
+
+    first = queue.render(student)
+    job_id = queue.submit(student)
+    assert queue.status(job_id)["cached"] is True
+    with open(first, "rb") as rendered, open(queue.result_path(job_id), "rb") as cached:
+        assert rendered.read() == cached.read()
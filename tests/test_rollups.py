@@ -0,0 +1,82 @@
+import sqlite3
+
+import pytest
+
+from database import ensure_center_rollups, rebuild_center_rollups
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE Center_Data (Center TEXT, `Course A` REAL, `Course B` REAL)")
+    conn.execute("INSERT INTO Center_Data VALUES ('North', 0, 0)")
+    conn.execute(
+        "CREATE TABLE Student_Data (`First Name` TEXT, `Last Name` TEXT, Center TEXT, "
+        "`Course A` TEXT, `Course B` TEXT, ID INTEGER PRIMARY KEY)"
+    )
+    return conn
+
+
+def center_data(conn):
+    return conn.execute("SELECT `Course A`, `Course B` FROM Center_Data").fetchall()
+
+
+def test_a_course_with_only_na_entries_has_no_average(conn):
+    conn.execute("INSERT INTO Student_Data VALUES ('Ada', 'Lovelace', 'North', '40', 'N.A', 1)")
+    ensure_center_rollups(conn)
+
+    assert center_data(conn) == [(40.0, None)]
+
+
+def rollups(conn):
+    return conn.execute("SELECT Center, Course, Total, Students, Missing FROM Center_Rollup ORDER BY 1, 2").fetchall()
+
+
+def test_direct_sql_edits_keep_the_rollups_and_center_data_in_step(conn):
+    ensure_center_rollups(conn)
+    conn.execute("INSERT INTO Student_Data VALUES ('Ada', 'Lovelace', 'North', '40', 'N.A', 1)")
+    conn.execute("INSERT INTO Student_Data VALUES ('Alan', 'Turing', 'North', '80', '60', 2)")
+    assert rollups(conn) == [("North", "Course A", 120.0, 2, 0), ("North", "Course B", 60.0, 1, 1)]
+    assert center_data(conn) == [(60.0, 60.0)]
+
+    conn.execute("UPDATE Student_Data SET `Course B` = '20' WHERE ID = 1")
+    assert center_data(conn) == [(60.0, 40.0)]
+
+    conn.execute("UPDATE Student_Data SET Center = 'South' WHERE ID = 2")
+    assert rollups(conn) == [
+        ("North", "Course A", 40.0, 1, 0), ("North", "Course B", 20.0, 1, 0),
+        ("South", "Course A", 80.0, 1, 0), ("South", "Course B", 60.0, 1, 0),
+    ]
+    assert center_data(conn) == [(40.0, 20.0)]
+
+    conn.execute("DELETE FROM Student_Data WHERE ID = 1")
+    assert rollups(conn)[:2] == [("North", "Course A", 0.0, 0, 0), ("North", "Course B", 0.0, 0, 0)]
+    assert center_data(conn) == [(None, None)]
+
+
+def test_a_new_category_is_rolled_up_after_the_next_write(conn):
+    conn.execute("INSERT INTO Student_Data VALUES ('Ada', 'Lovelace', 'North', '40', '50', 1)")
+    ensure_center_rollups(conn)
+    conn.execute("ALTER TABLE Student_Data ADD COLUMN `Course Z` TEXT")
+    conn.execute("ALTER TABLE Center_Data ADD COLUMN `Course Z` REAL")
+
+    ensure_center_rollups(conn)  # As the form does before each save
+    conn.execute("UPDATE Student_Data SET `Course Z` = '70' WHERE ID = 1")
+    conn.execute("INSERT INTO Student_Data VALUES ('Alan', 'Turing', 'North', '80', '60', 2, NULL)")
+
+    assert ("North", "Course Z", 70.0, 1, 1) in rollups(conn)
+    assert conn.execute("SELECT `Course Z` FROM Center_Data").fetchone() == (70.0,)
+    before = rollups(conn)
+    rebuild_center_rollups(conn)
+    assert rollups(conn) == before
+
+
+def test_up_to_date_rollups_are_left_alone(conn):
+    conn.execute("INSERT INTO Student_Data VALUES ('Ada', 'Lovelace', 'North', '40', '50', 1)")
+    ensure_center_rollups(conn)
+    version = conn.execute("PRAGMA schema_version").fetchone()[0]
+    conn.execute("UPDATE Center_Rollup SET Total = 0")  # Would be repaired by a rebuild
+
+    ensure_center_rollups(conn)
+    assert conn.execute("PRAGMA schema_version").fetchone()[0] == version
+    assert rollups(conn)[0][2] == 0
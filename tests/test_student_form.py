@@ -0,0 +1,118 @@
+import importlib.util
+import os
+import sqlite3
+
+import pytest
+
+import database
+from database import (
+    WriteQueue,
+    ensure_center_rollups,
+    ensure_student_change_log,
+    ensure_student_identity,
+    ensure_student_search,
+)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COURSES = ["Course A", "Course B"]
+
+
+def load_form():
+    spec = importlib.util.spec_from_file_location("student_form", os.path.join(ROOT, "Student Form.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def db_file(tmp_path):
+    path = str(tmp_path / "graph_data.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE Center_Data (Center TEXT, `Course A` REAL, `Course B` REAL)")
+    conn.execute("INSERT INTO Center_Data VALUES ('North', 0, 0)")
+    conn.execute(
+        "CREATE TABLE Student_Data (`First Name` TEXT, `Last Name` TEXT, Center TEXT, "
+        "`Course A` TEXT, `Course B` TEXT, ID INTEGER PRIMARY KEY)"
+    )
+    ensure_student_change_log(conn)
+    ensure_student_search(conn)
+    ensure_center_rollups(conn)
+    conn.commit()
+    conn.close()
+    return path
+
+
+def save_twice(form, db_file):
+    queue = WriteQueue(db_file)
+    first = queue.run(form.save_student, "Ada", "Lovelace", "North", COURSES, [10, "N.A"])
+    second = queue.run(form.save_student, "Ada", "Lovelace", "North", COURSES, [90, 50])
+    return first, second
+
+
+def test_saving_an_existing_student_updates_it(db_file):
+    conn = sqlite3.connect(db_file)
+    ensure_student_identity(conn)
+    conn.commit()
+
+    assert save_twice(load_form(), db_file) == ("Data saved successfully!", "Data updated successfully!")
+    assert conn.execute("SELECT `Course A`, `Course B` FROM Student_Data").fetchall() == [("90", "50")]
+    assert conn.execute("SELECT COUNT(*) FROM Student_Changes").fetchone()[0] == 1
+    assert conn.execute("SELECT `Course A`, `Course B` FROM Center_Data").fetchall() == [(90.0, 50.0)]
+
+
+def test_saving_without_the_unique_index_falls_back(db_file):
+    conn = sqlite3.connect(db_file)
+    conn.execute("INSERT INTO Student_Data (`First Name`, `Last Name`, Center) VALUES ('Dup', 'Name', 'North')")
+    conn.execute("INSERT INTO Student_Data (`First Name`, `Last Name`, Center) VALUES ('Dup', 'Name', 'North')")
+    conn.commit()
+    with pytest.raises(sqlite3.IntegrityError):
+        ensure_student_identity(conn)
+
+    assert save_twice(load_form(), db_file) == ("Data saved successfully!", "Data updated successfully!")
+    assert conn.execute(
+        "SELECT `Course A`, `Course B` FROM Student_Data WHERE `First Name` = 'Ada'"
+    ).fetchall() == [("90", "50")]
+
+
+def test_saving_after_a_new_category_keeps_the_rollups_right(db_file):
+    form = load_form()
+    queue = WriteQueue(db_file)
+    queue.run(form.save_student, "Ada", "Lovelace", "North", COURSES, [10, 20])
+    queue.run(form.save_student, "Alan", "Turing", "North", COURSES, [30, 40])
+    conn = sqlite3.connect(db_file)
+    conn.execute("ALTER TABLE Student_Data ADD COLUMN `Course Z` TEXT")
+    conn.commit()
+
+    queue.run(form.save_student, "Ada", "Lovelace", "North", COURSES + ["Course Z"], [10, 20, 70])
+    assert conn.execute(
+        "SELECT Total, Students, Missing FROM Center_Rollup WHERE Course = 'Course Z'"
+    ).fetchall() == [(70.0, 1, 1)]
+
+
+def test_the_batch_api_reports_each_record(db_file, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # The app opens graph_data.db from the working directory
+    monkeypatch.setattr(database, "_registries", {})
+    client = load_form().create_app().server.test_client()
+
+    response = client.post("/api/students", json=[
+        {"first_name": "Ada", "last_name": "Lovelace", "center": "North", "courses": {"Course A": 40}},
+        {"first_name": "Alan", "last_name": "Turing", "center": "Nowhere"},
+        {"first_name": "Ada", "last_name": "Lovelace", "center": "North", "courses": {"Course B": "N.A"}},
+        {"first_name": "Grace", "last_name": "Hopper", "center": "North", "courses": {"Course Q": 1}},
+        "not a record",
+    ])
+    body = response.get_json()
+    assert (body["inserted"], body["updated"], body["errors"]) == (1, 0, 3)
+    assert [(result["index"], result["status"]) for result in body["results"]] == [
+        (0, "inserted"), (1, "error"), (2, "inserted"), (3, "error"), (4, "error"),
+    ]
+    assert body["results"][3]["error"] == "Unknown course(s): Course Q"
+    conn = sqlite3.connect(db_file)
+    assert conn.execute("SELECT `Course A`, `Course B` FROM Student_Data").fetchall() == [("40", "N.A")]
+
+    body = client.post("/api/students", json={"students": [
+        {"first_name": "Ada", "last_name": "Lovelace", "center": "North", "courses": {"Course A": 90}},
+    ]}).get_json()
+    assert body["results"] == [{"index": 0, "status": "updated"}]
+    assert conn.execute("SELECT `Course A`, `Course B` FROM Student_Data").fetchall() == [("90", "N.A")]
+    assert client.post("/api/students", json={"no": "list"}).status_code == 400
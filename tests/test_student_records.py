@@ -0,0 +1,112 @@
+import importlib.util
+import os
+import sqlite3
+
+import pytest
+
+from database import ConnectionPool, CourseRegistry, ensure_student_change_log, ensure_student_search
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_records():
+    spec = importlib.util.spec_from_file_location("student_records", os.path.join(ROOT, "Student Records.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def db_file(tmp_path):
+    path = str(tmp_path / "graph_data.db")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE Student_Data (`First Name` TEXT, `Last Name` TEXT, Center TEXT, "
+        "`Course A` TEXT, ID INTEGER PRIMARY KEY)"
+    )
+    ensure_student_change_log(conn)
+    ensure_student_search(conn)
+    conn.commit()
+    conn.close()
+    return path
+
+
+@pytest.fixture
+def records(db_file):
+    module = load_records()
+    module.course_registry = CourseRegistry(db_file)
+    module.pool = ConnectionPool(db_file)
+    module.student_cache = module.StudentCache(module.pool)
+    return module
+
+
+def write(db_file, sql, params=()):
+    conn = sqlite3.connect(db_file)
+    with conn:
+        conn.executemany(sql, params) if isinstance(params, list) else conn.execute(sql, params)
+    conn.close()
+
+
+def ids(page):
+    records, has_previous, has_next = page
+    return [record.id for record in records], has_previous, has_next
+
+
+def test_pages_of_one_center(records, db_file):
+    write(db_file, "INSERT INTO Student_Data VALUES (?, ?, ?, '50', ?)",
+          [(f"First{i}", f"Last{i}", "Rare" if i % 10 == 0 else "Common", i) for i in range(1, 101)])
+    cache = records.student_cache
+
+    assert ids(cache.page(centers=["Rare"], page_size=4)) == ([10, 20, 30, 40], False, True)
+    assert ids(cache.page(after=40, centers=["Rare"], page_size=4)) == ([50, 60, 70, 80], True, True)
+    assert ids(cache.page(after=80, centers=["Rare"], page_size=4)) == ([90, 100], True, False)
+    assert ids(cache.page(before=50, centers=["Rare"], page_size=4)) == ([10, 20, 30, 40], False, True)
+    assert ids(cache.page(after=8, centers=["Rare", "Common"], page_size=3)) == ([9, 10, 11], True, True)
+    assert [record.id for record in cache.select(["Rare"])] == list(range(10, 101, 10))
+
+
+def test_center_pages_follow_moves_and_deletes(records, db_file):
+    write(db_file, "INSERT INTO Student_Data VALUES (?, ?, ?, '50', ?)",
+          [(f"First{i}", f"Last{i}", "North", i) for i in range(1, 6)])
+    cache = records.student_cache
+    assert ids(cache.page(centers=["South"])) == ([], False, False)
+
+    write(db_file, "UPDATE Student_Data SET Center = 'South' WHERE ID IN (2, 4)")
+    write(db_file, "DELETE FROM Student_Data WHERE ID = 3")
+    assert ids(cache.page(centers=["South"])) == ([2, 4], False, False)
+    assert ids(cache.page(centers=["North"])) == ([1, 5], False, False)
+    assert ids(cache.page()) == ([1, 2, 4, 5], False, False)
+
+
+def test_the_cache_follows_updates_deletes_and_reused_ids(records, db_file):
+    write(db_file, "INSERT INTO Student_Data VALUES (?, ?, 'North', '10', ?)",
+          [(f"First{i}", f"Last{i}", i) for i in range(1, 4)])
+    cache = records.student_cache
+    assert [record.id for record in cache.select()] == [1, 2, 3]
+    assert cache.full_loads == 1
+
+    write(db_file, "UPDATE Student_Data SET `Course A` = '90' WHERE ID = 2")
+    write(db_file, "DELETE FROM Student_Data WHERE ID = 3")  # The highest ID, so SQLite hands it out again
+    assert cache.get(2).progress == ("90",)
+    assert cache.get(3) is None
+
+    write(db_file, "INSERT INTO Student_Data (`First Name`, `Last Name`, Center) VALUES ('New', 'Student', 'South')")
+    write(db_file, "DELETE FROM Student_Data WHERE ID = 1")
+    assert [(record.id, record.first_name) for record in cache.select()] == [(2, "First2"), (3, "New")]
+
+    write(db_file, "INSERT INTO Student_Data VALUES ('Back', 'Again', 'South', '70', 1)")  # Below the watermark
+    assert [(record.id, record.first_name) for record in cache.select()] == [(1, "Back"), (2, "First2"), (3, "New")]
+    assert (cache.full_loads, cache.incremental_loads) == (1, 3)
+
+
+def test_search_results_come_in_keyset_pages(records, db_file):
+    write(db_file, "INSERT INTO Student_Data VALUES (?, ?, ?, '50', ?)",
+          [("Ada" if i % 2 else "Alan", f"Last{i}", "North" if i < 8 else "South", i) for i in range(1, 11)])
+
+    assert ids(records.search_students("ad", page_size=2)) == ([1, 3], False, True)
+    assert ids(records.search_students("ad", after=3, page_size=2)) == ([5, 7], True, True)
+    assert ids(records.search_students("ad", after=7, page_size=2)) == ([9], True, False)
+    assert ids(records.search_students("ad", before=5, page_size=2)) == ([1, 3], False, True)
+    assert ids(records.search_students("a south", page_size=5)) == ([8, 9, 10], False, False)
+    assert ids(records.search_students("ad", centers=["South"])) == ([9], False, False)
+    assert ids(records.search_students("", page_size=3)) == ([1, 2, 3], False, True)
@@ -0,0 +1,65 @@
+"""Production entry point: the dashboard, form and records apps behind one WSGI application.
+
+Run under a multi-process WSGI server, e.g.:
+
+    gunicorn -c gunicorn.conf.py wsgi:application
+
+The apps are mounted at /dashboard/, /form/ and /records/; "/" redirects to the dashboard.
+"""
+import importlib.util
+import os
+import sys
+
+import flask
+from werkzeug.middleware.dispatcher import DispatcherMiddleware
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+
+# Mount prefix -> app file. The file names contain spaces, so they are loaded by path.
+MOUNTS = {
+    "/dashboard": "Dashboard.py",
+    "/form": "Student Form.py",
+    "/records": "Student Records.py",
+}
+
+
+def load_app_module(filename):
+    name = os.path.splitext(filename)[0].replace(" ", "_").lower()
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def create_application():
+    """Build the root Flask server and mount each Dash app's server under its prefix."""
+    root = flask.Flask(__name__)
+
+    @root.route("/")
+    def index():
+        return flask.redirect("/dashboard/")
+
+    @root.route("/healthz")
+    def healthz():
+        return "ok"
+
+    mounts = {}
+    for prefix, filename in MOUNTS.items():
+        dash_app = load_app_module(filename).create_app(requests_pathname_prefix=prefix + "/")
+        # DashboardApp wraps its Dash instance; the other factories return the Dash app itself
+        dash_app = getattr(dash_app, "app", dash_app)
+        mounts[prefix] = dash_app.server
+
+    root.wsgi_app = DispatcherMiddleware(root.wsgi_app, mounts)
+    return root
+
+
+application = create_application()
+
+
+if __name__ == "__main__":
+    # Fallback without gunicorn (POSIX only): werkzeug's forking server
+    from werkzeug.serving import run_simple
+
+    run_simple("0.0.0.0", 8000, application, processes=os.cpu_count() or 2, threaded=False)